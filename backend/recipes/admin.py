@@ -1,7 +1,7 @@
 from django.contrib import admin
 
 from .models import (Favorite, Ingredient, IngredientInRecipe, Recipe,
-                     ShoppingCart, Tag, TagsInRecipe)
+                     RecipeScore, ShoppingCart, Tag, TagsInRecipe)
 
 
 class TagAdmin(admin.ModelAdmin):
@@ -22,7 +22,9 @@ class IngredientInRecipeAdminInline(admin.TabularInline):
 
 
 class RecipeAdmin(admin.ModelAdmin):
-    list_display = ('id', 'name', 'author')
+    list_display = ('id', 'name', 'author', 'favorites_count',
+                    'in_carts_count')
+    readonly_fields = ('favorites_count', 'in_carts_count')
     inlines = (IngredientInRecipeAdminInline, TagsInRecipeInline)
     search_fields = ('author', 'name')
     list_filter = ('author', 'name', 'tags')
@@ -51,6 +53,10 @@ class ShoppingCartAdmin(admin.ModelAdmin):
     search_fields = ('user', 'recipe')
 
 
+class RecipeScoreAdmin(admin.ModelAdmin):
+    list_display = ('recipe', 'popular', 'trending', 'updated_at')
+
+
 admin.site.register(Tag, TagAdmin)
 admin.site.register(Recipe, RecipeAdmin)
 admin.site.register(Ingredient, IngredientAdmin)
@@ -58,3 +64,4 @@ admin.site.register(IngredientInRecipe, IngredientInRecipeAdmin)
 admin.site.register(TagsInRecipe, TagsInRecipeAdmin)
 admin.site.register(Favorite, FavoriteAdmin)
 admin.site.register(ShoppingCart, ShoppingCartAdmin)
+admin.site.register(RecipeScore, RecipeScoreAdmin)
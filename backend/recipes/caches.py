@@ -0,0 +1,90 @@
+import threading
+from uuid import uuid4
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from .models import ShoppingCart
+
+_pending = threading.local()
+
+
+def cart_generation_key(user_id):
+    return f'shopping_cart:generation:{user_id}'
+
+
+def shopping_list_key(user_id, generation, export_format):
+    return f'shopping_cart:list:{user_id}:{generation}:{export_format}'
+
+
+def get_cart_generation(user_id):
+    """
+    Returns the current generation of the user's shopping cart.
+    A random token is used instead of a number, so a counter
+    evicted from the cache can never repeat an old value.
+    """
+    key = cart_generation_key(user_id)
+    generation = cache.get(key)
+    if generation is None:
+        cache.add(key, uuid4().hex, timeout=None)
+        generation = cache.get(key)
+    return generation
+
+
+def bump_cart_generation(user_ids):
+    """
+    Invalidates cached shopping lists of the given users.
+    """
+    generation = uuid4().hex
+    cache.set_many(
+        {cart_generation_key(user_id): generation for user_id in user_ids},
+        timeout=None
+    )
+
+
+def cache_chunks(key, chunks):
+    """
+    Yields chunks unchanged and stores the joined bytes in the cache
+    once the iterator is exhausted, unless the artifact is larger
+    than SHOPPING_LIST_CACHE_MAX_SIZE.
+    """
+    collected = []
+    size = 0
+    for chunk in chunks:
+        yield chunk
+        if collected is None:
+            continue
+        if isinstance(chunk, str):
+            chunk = chunk.encode('utf-8')
+        size += len(chunk)
+        if size > settings.SHOPPING_LIST_CACHE_MAX_SIZE:
+            collected = None
+            continue
+        collected.append(chunk)
+    if collected is not None:
+        cache.set(
+            key, b''.join(collected),
+            timeout=settings.SHOPPING_LIST_CACHE_TIMEOUT
+        )
+
+
+def invalidate_recipe_carts(recipe_id):
+    """
+    Bumps cart generations of all users having the recipe in their
+    cart, once the current transaction is committed. Recipes changed
+    in one transaction are flushed together with a single query.
+    """
+    pending = _pending.__dict__.setdefault('recipe_ids', set())
+    pending.add(recipe_id)
+    transaction.on_commit(_flush_pending_recipes)
+
+
+def _flush_pending_recipes():
+    recipe_ids = getattr(_pending, 'recipe_ids', None)
+    if not recipe_ids:
+        return
+    _pending.recipe_ids = set()
+    bump_cart_generation(set(ShoppingCart.objects.filter(
+        recipe_id__in=recipe_ids
+    ).values_list('user_id', flat=True)))
@@ -0,0 +1,77 @@
+import threading
+from collections import defaultdict
+from contextlib import contextmanager
+from functools import reduce
+from operator import or_
+
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce, Greatest
+
+_deferred = threading.local()
+
+
+def change_counter(queryset, field, delta):
+    """
+    Atomically adds 'delta' to a denormalized counter column with
+    a single UPDATE, never letting it drop below zero.
+    """
+    changes = getattr(_deferred, 'changes', None)
+    if changes is not None:
+        changes[queryset.model, field, delta].append(queryset)
+        return
+    queryset.update(**{field: Greatest(F(field) + delta, 0)})
+
+
+@contextmanager
+def deferred_counters():
+    """
+    Collects counter changes made inside the block and applies them
+    on exit with one UPDATE per model, field and delta. Each object
+    must be changed at most once per field inside the block.
+    """
+    if getattr(_deferred, 'changes', None) is not None:
+        yield
+        return
+    _deferred.changes = changes = defaultdict(list)
+    try:
+        yield
+    finally:
+        _deferred.changes = None
+    for (model, field, delta), querysets in changes.items():
+        change_counter(reduce(or_, querysets), field, delta)
+
+
+class CounterFieldsMixin:
+    """
+    Keeps denormalized counters out of regular saves of an existing
+    object: the loaded values may be stale, so they are changed only
+    with change_counter().
+    """
+
+    counter_fields = ()
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding and self.pk is not None:
+            update_fields = kwargs.get('update_fields')
+            if update_fields is None:
+                update_fields = [
+                    field.name for field in self._meta.concrete_fields
+                    if not field.primary_key
+                ]
+            kwargs['update_fields'] = [
+                name for name in update_fields
+                if name not in self.counter_fields
+            ]
+        super().save(*args, **kwargs)
+
+
+def count_subquery(model, field):
+    """
+    Correlated subquery counting rows of 'model' pointing at the
+    outer object through 'field'.
+    """
+    return Coalesce(Subquery(
+        model.objects.filter(**{field: OuterRef('pk')}).order_by().values(
+            field
+        ).annotate(total=Count('pk')).values('total')
+    ), 0)
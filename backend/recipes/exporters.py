@@ -0,0 +1,134 @@
+import csv
+import os
+import tempfile
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from reportlab.lib.pagesizes import A4
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont
+from reportlab.pdfgen import canvas
+
+CHUNK_SIZE = 64 * 1024
+
+
+class Echo:
+    """
+    File-like object which returns the written value instead of
+    buffering it. Used to stream csv.writer output.
+    """
+
+    def write(self, value):
+        return value
+
+
+class BaseExporter:
+    """
+    Turns an iterator of aggregated ingredients into chunks of
+    a shopping list file. Every item is a dict with 'name',
+    'measurement_unit' and 'amount' keys.
+    """
+
+    content_type = None
+    extension = None
+
+    def __init__(self, items):
+        self.items = items
+
+    @classmethod
+    def check(cls):
+        """
+        Raises ImproperlyConfigured if the format cannot be rendered
+        with the current settings.
+        """
+
+    def __iter__(self):
+        raise NotImplementedError
+
+
+class TextExporter(BaseExporter):
+    content_type = 'text/plain; charset=utf-8'
+    extension = 'txt'
+
+    def __iter__(self):
+        for item in self.items:
+            yield (f"{item['name']} - {item['amount']} "
+                   f"({item['measurement_unit']})\n")
+
+
+class CsvExporter(BaseExporter):
+    content_type = 'text/csv; charset=utf-8'
+    extension = 'csv'
+
+    def __iter__(self):
+        writer = csv.writer(Echo())
+        yield writer.writerow(['Ингредиент', 'Количество', 'Единица'])
+        for item in self.items:
+            yield writer.writerow(
+                [item['name'], item['amount'], item['measurement_unit']]
+            )
+
+
+class PdfExporter(BaseExporter):
+    """
+    PDF needs a cross-reference table at the end of the file, so
+    the document is rendered into a spooled temporary file (kept in
+    memory while small, moved to disk when large) and then streamed
+    back in chunks.
+    """
+
+    content_type = 'application/pdf'
+    extension = 'pdf'
+    font_name = 'ShoppingListFont'
+    font_size = 12
+    line_height = 18
+    margin = 50
+
+    @classmethod
+    def check(cls):
+        """
+        The built-in PDF fonts have no Cyrillic glyphs, so a list
+        without the configured TrueType font would be unreadable.
+        """
+        font_path = getattr(settings, 'SHOPPING_LIST_PDF_FONT', None)
+        if not font_path or not os.path.exists(font_path):
+            raise ImproperlyConfigured(
+                f'Шрифт SHOPPING_LIST_PDF_FONT не найден: {font_path}'
+            )
+
+    def get_font(self):
+        self.check()
+        if self.font_name not in pdfmetrics.getRegisteredFontNames():
+            pdfmetrics.registerFont(
+                TTFont(self.font_name, settings.SHOPPING_LIST_PDF_FONT)
+            )
+        return self.font_name
+
+    def __iter__(self):
+        font = self.get_font()
+        width, height = A4
+        with tempfile.SpooledTemporaryFile(max_size=CHUNK_SIZE) as buffer:
+            pdf = canvas.Canvas(buffer, pagesize=A4, pageCompression=1)
+            pdf.setFont(font, self.font_size)
+            y = height - self.margin
+            for item in self.items:
+                if y < self.margin:
+                    pdf.showPage()
+                    pdf.setFont(font, self.font_size)
+                    y = height - self.margin
+                pdf.drawString(
+                    self.margin, y,
+                    f"{item['name']} - {item['amount']} "
+                    f"({item['measurement_unit']})"
+                )
+                y -= self.line_height
+            pdf.save()
+            buffer.seek(0)
+            for chunk in iter(lambda: buffer.read(CHUNK_SIZE), b''):
+                yield chunk
+
+
+EXPORTERS = {
+    exporter.extension: exporter
+    for exporter in (TextExporter, CsvExporter, PdfExporter)
+}
@@ -0,0 +1,83 @@
+from django.conf import settings
+from django.db.models import F
+
+from users.models import Follow
+
+from .models import FeedEntry, Recipe, User
+
+
+def is_pull_author(author_id):
+    """
+    Recipes of authors with too many followers are not copied to
+    every feed, they are merged in when the feed is read.
+    """
+    return User.objects.filter(
+        pk=author_id,
+        followers_count__gt=settings.FEED_FANOUT_MAX_FOLLOWERS
+    ).exists()
+
+
+def write_entries(entries):
+    FeedEntry.objects.bulk_create(
+        entries,
+        batch_size=settings.FEED_FANOUT_BATCH_SIZE,
+        ignore_conflicts=True
+    )
+
+
+def fan_out_recipe(recipe):
+    if is_pull_author(recipe.author_id):
+        return
+    followers = Follow.objects.filter(author_id=recipe.author_id).values_list(
+        'user_id', flat=True
+    )
+    batch = []
+    for user_id in followers.iterator():
+        batch.append(FeedEntry(
+            user_id=user_id, recipe_id=recipe.id, pub_date=recipe.pub_date
+        ))
+        if len(batch) == settings.FEED_FANOUT_BATCH_SIZE:
+            write_entries(batch)
+            batch = []
+    if batch:
+        write_entries(batch)
+
+
+def backfill_follow(follow):
+    if is_pull_author(follow.author_id):
+        return
+    recipes = Recipe.objects.filter(author_id=follow.author_id).values_list(
+        'id', 'pub_date'
+    )[:settings.FEED_BACKFILL_SIZE]
+    write_entries([
+        FeedEntry(user_id=follow.user_id, recipe_id=recipe_id, pub_date=date)
+        for recipe_id, date in recipes
+    ])
+
+
+def prune_follow(follow):
+    FeedEntry.objects.filter(
+        user_id=follow.user_id, recipe__author_id=follow.author_id
+    ).delete()
+
+
+def get_feed_branches(user, queryset):
+    """
+    Splits the feed of the user into recipe querysets annotated with
+    the 'feed_date' they are ordered by, each read through an index
+    of its own: fanned-out entries through the (user, -pub_date,
+    -recipe) index of FeedEntry, recipes of pull-mode authors through
+    the (author, -pub_date, -id) index of Recipe.
+    """
+    branches = [queryset.filter(feed_entries__user=user).annotate(
+        feed_date=F('feed_entries__pub_date')
+    )]
+    pull_authors = list(Follow.objects.filter(
+        user=user,
+        author__followers_count__gt=settings.FEED_FANOUT_MAX_FOLLOWERS
+    ).values_list('author_id', flat=True))
+    if pull_authors:
+        branches.append(queryset.filter(author_id__in=pull_authors).annotate(
+            feed_date=F('pub_date')
+        ))
+    return branches
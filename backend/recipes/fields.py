@@ -1,33 +1,86 @@
 import base64
-import imghdr
+import binascii
 import uuid
 
-import six
-from django.core.files.base import ContentFile
+from django.conf import settings
+from django.core.files.uploadedfile import TemporaryUploadedFile
+from PIL import Image
 from rest_framework import serializers
 
+# Must be a multiple of 4, so every chunk decodes on its own.
+BASE64_CHUNK_SIZE = 4 * 64 * 1024
+
+IMAGE_EXTENSIONS = {
+    'JPEG': 'jpg',
+    'PNG': 'png',
+    'GIF': 'gif',
+    'WEBP': 'webp',
+}
+
 
 class Base64ImageField(serializers.ImageField):
+    """
+    Accepts images as base64 data URLs. The payload is decoded in
+    chunks into a temporary file and its format is detected with
+    Pillow, so large uploads are never held in memory twice.
+
+    The temporary file does not come from the request's files, so
+    nothing closes it for the request: the serializer calls
+    close_upload() when validation fails or the image is stored.
+    """
+
+    upload = None
 
     def to_internal_value(self, data):
 
-        if isinstance(data, six.string_types):
+        if isinstance(data, str):
             if 'data:' in data and ';base64,' in data:
-                header, data = data.split(';base64,')
+                header, data = data.split(';base64,', 1)
+            # MIME-wrapped base64 has line breaks, which would shift
+            # the chunks off the 4-character boundaries.
+            data = ''.join(data.split())
+            upload = self.decode(data)
+            self.upload = upload
+            image_format = self.get_image_format(upload)
+            upload.name = '%s.%s' % (
+                str(uuid.uuid4())[:12], IMAGE_EXTENSIONS[image_format]
+            )
+            upload.content_type = Image.MIME[image_format]
+            data = upload
 
-            try:
-                decoded_file = base64.b64decode(data)
-            except TypeError:
-                self.fail('invalid_image')
+        return super().to_internal_value(data)
 
-            file_name = str(uuid.uuid4())[:12]
-            file_extension = self.get_file_extension(file_name, decoded_file)
-            complete_file_name = '%s.%s' % (file_name, file_extension, )
-            data = ContentFile(decoded_file, name=complete_file_name)
+    def close_upload(self):
+        if self.upload is not None:
+            self.upload.close()
+            self.upload = None
 
-        return super().to_internal_value(data)
+    def decode(self, data):
+        upload = TemporaryUploadedFile(
+            'upload', 'application/octet-stream', 0, None
+        )
+        try:
+            for start in range(0, len(data), BASE64_CHUNK_SIZE):
+                upload.write(base64.b64decode(
+                    data[start:start + BASE64_CHUNK_SIZE], validate=True
+                ))
+        except (binascii.Error, ValueError):
+            upload.close()
+            self.fail('invalid_image')
+        upload.size = upload.tell()
+        upload.seek(0)
+        return upload
 
-    def get_file_extension(self, file_name, decoded_file):
-        extension = imghdr.what(file_name, decoded_file)
-        extension = 'jpg' if extension == 'jpeg' else extension
-        return extension
+    def get_image_format(self, upload):
+        try:
+            with Image.open(upload) as image:
+                image_format = image.format
+                width, height = image.size
+        except (OSError, Image.DecompressionBombError):
+            image_format = None
+        if (image_format not in IMAGE_EXTENSIONS
+                or width * height > settings.RECIPE_IMAGE_MAX_PIXELS):
+            upload.close()
+            self.fail('invalid_image')
+        upload.seek(0)
+        return image_format
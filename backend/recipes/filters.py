@@ -1,35 +1,99 @@
 from django.contrib.auth import get_user_model
+from django.contrib.postgres.search import (SearchQuery, SearchRank,
+                                            TrigramSimilarity)
+from django.db import connection
+from django.db.models import Exists, F, OuterRef, Q
 from django_filters import rest_framework as filters
 
-from .models import Ingredient, Recipe
+from .models import (Favorite, Ingredient, Recipe, ShoppingCart, Tag,
+                     TagsInRecipe)
 
 User = get_user_model()
 
 
 class RecipeFilter(filters.FilterSet):
-    tags = filters.AllValuesMultipleFilter(
-        field_name='tags__slug'
+    tags = filters.ModelMultipleChoiceFilter(
+        field_name='tags__slug',
+        to_field_name='slug',
+        queryset=Tag.objects.all(),
+        method='get_tags'
     )
     is_favorited = filters.BooleanFilter(method='get_favorite')
     is_in_shopping_cart = filters.BooleanFilter(
         method='get_is_in_shopping_cart'
     )
+    search = filters.CharFilter(method='get_search')
+    ordering = filters.ChoiceFilter(
+        choices=(('popular', 'popular'), ('trending', 'trending')),
+        method='get_ordering'
+    )
 
     class Meta:
         model = Recipe
-        fields = ('is_favorited', 'tags', 'author', 'is_in_shopping_cart', )
+        fields = ('is_favorited', 'tags', 'author', 'is_in_shopping_cart',
+                  'search', 'ordering', )
+
+    def get_tags(self, queryset, name, value):
+        if not value:
+            return queryset
+        return queryset.filter(Exists(TagsInRecipe.objects.filter(
+            recipe=OuterRef('pk'), tag__in=value
+        )))
 
     def get_favorite(self, queryset, name, value):
-        user = self.request.user
-        if value:
-            return Recipe.objects.filter(favorites__user=user).distinct()
-        return Recipe.objects.all()
+        return self.filter_user_relation(
+            queryset, 'is_favorited', Favorite, value
+        )
 
     def get_is_in_shopping_cart(self, queryset, name, value):
+        return self.filter_user_relation(
+            queryset, 'is_in_shopping_cart', ShoppingCart, value
+        )
+
+    def filter_user_relation(self, queryset, annotation, model, value):
+        """
+        Narrows the incoming queryset to recipes related to the
+        current user, reusing the view's Exists() annotation if present.
+        """
+        if not value:
+            return queryset
         user = self.request.user
-        if value:
-            return Recipe.objects.filter(shopping_cart__user=user)
-        return Recipe.objects.all()
+        if user.is_anonymous:
+            return queryset.none()
+        if annotation in queryset.query.annotations:
+            return queryset.filter(**{annotation: True})
+        return queryset.filter(Exists(model.objects.filter(
+            user=user, recipe=OuterRef('pk')
+        )))
+
+    def get_ordering(self, queryset, name, value):
+        """
+        Orders recipes by a score precomputed in RecipeScore. Every
+        recipe has a score, so the join is an inner one and pages are
+        read from the (score, recipe) index.
+        """
+        return queryset.filter(score__isnull=False).order_by(
+            f'-score__{value}', '-score__recipe_id'
+        )
+
+    def get_search(self, queryset, name, value):
+        """
+        Full-text search over the trigger-maintained 'search_vector'
+        column with a trigram fallback on the name for typos. Both
+        conditions are served by GIN indexes.
+        """
+        value = value.strip()
+        if not value:
+            return queryset
+        if connection.vendor != 'postgresql':
+            return queryset.filter(name__icontains=value)
+        query = SearchQuery(value, config='russian', search_type='websearch')
+        return queryset.filter(
+            Q(search_vector=query) | Q(name__trigram_similar=value)
+        ).annotate(
+            rank=SearchRank(F('search_vector'), query)
+            + TrigramSimilarity('name', value)
+        ).order_by('-rank', '-pub_date')
 
 
 class IngredientFilter(filters.FilterSet):
@@ -0,0 +1,152 @@
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connections, transaction
+from PIL import Image, ImageOps
+
+from .models import Recipe
+from .storage import lock_file
+
+logger = logging.getLogger(__name__)
+
+SAVE_OPTIONS = {
+    'webp': {'format': 'WEBP', 'quality': 80, 'method': 4},
+    'jpeg': {'format': 'JPEG', 'quality': 82, 'optimize': True,
+             'progressive': True},
+}
+EXTENSIONS = {'webp': 'webp', 'jpeg': 'jpg'}
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.IMAGE_PROCESSING_WORKERS,
+                thread_name_prefix='renditions'
+            )
+    return _executor
+
+
+def rendition_name(name, rendition, size, image_format):
+    """
+    The size is part of the name, so changing RECIPE_IMAGE_RENDITIONS
+    never serves stale files cached as immutable.
+    """
+    stem, _ = os.path.splitext(name)
+    return f'{stem}_{rendition}_{size}.{EXTENSIONS[image_format]}'
+
+
+def build_renditions(name, storage=default_storage):
+    """
+    Saves resized copies of the image beside the original, one per
+    rendition and format. Images are never upscaled. Returns the
+    stored names by rendition and format.
+
+    The name of a copy is derived from the content hash of the
+    original and the rendition spec, so an existing copy already has
+    the right bytes. It is kept as is: the files are served as
+    immutable and rewriting one would answer 404 in between.
+    """
+    files = {}
+    with storage.open(name) as file, Image.open(file) as original:
+        image = ImageOps.exif_transpose(original)
+        for rendition, size in settings.RECIPE_IMAGE_RENDITIONS.items():
+            resized = None
+            for image_format in settings.RECIPE_IMAGE_FORMATS:
+                target = rendition_name(name, rendition, size, image_format)
+                if storage.exists(target):
+                    files.setdefault(rendition, {})[image_format] = target
+                    continue
+                if resized is None:
+                    resized = image.copy()
+                    resized.thumbnail((size, size), Image.LANCZOS)
+                converted = resized
+                if image_format == 'jpeg' and resized.mode != 'RGB':
+                    converted = resized.convert('RGB')
+                elif resized.mode not in ('RGB', 'RGBA'):
+                    converted = resized.convert('RGBA')
+                buffer = BytesIO()
+                converted.save(buffer, **SAVE_OPTIONS[image_format])
+                files.setdefault(rendition, {})[image_format] = storage.save(
+                    target, ContentFile(buffer.getvalue())
+                )
+    return files
+
+
+def process_recipe_image(name):
+    try:
+        files = build_renditions(name)
+        Recipe.objects.filter(image=name).update(
+            image_renditions={'source': name, 'files': files}
+        )
+    except Exception:
+        logger.exception('Не удалось обработать изображение %s', name)
+
+
+def _process_in_background(name):
+    try:
+        process_recipe_image(name)
+    finally:
+        connections.close_all()
+
+
+def schedule_renditions(name):
+    """
+    Builds renditions of the image in a background thread, so the
+    request that uploaded it does not wait for the resizing.
+    """
+    get_executor().submit(_process_in_background, name)
+
+
+def release_image(name, renditions):
+    """
+    Deletes the image and its renditions once no recipe references
+    the file any more; identical uploads share one stored file. The
+    check is made under the lock of the name, so an upload of the
+    same content that is not committed yet is waited for. Returns
+    True if the image was deleted.
+    """
+    if not name:
+        return False
+    with transaction.atomic():
+        lock_file(name)
+        if Recipe.objects.filter(image=name).exists():
+            return False
+        storage = Recipe._meta.get_field('image').storage
+        storage.delete(name)
+        for formats in renditions.get('files', {}).values():
+            for rendition in formats.values():
+                default_storage.delete(rendition)
+    return True
+
+
+def needs_renditions(recipe):
+    return bool(recipe.image) and (
+        recipe.image_renditions.get('source') != recipe.image.name
+    )
+
+
+def rendition_urls(recipe, request):
+    """
+    Returns absolute URLs of the ready renditions by rendition and
+    format; empty until the background processing is done.
+    """
+    if not recipe.image or needs_renditions(recipe):
+        return {}
+    return {
+        rendition: {
+            image_format: request.build_absolute_uri(default_storage.url(name))
+            for image_format, name in formats.items()
+        }
+        for rendition, formats in recipe.image_renditions['files'].items()
+    }
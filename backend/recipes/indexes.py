@@ -0,0 +1,79 @@
+import threading
+from bisect import bisect_left
+from uuid import uuid4
+
+from django.core.cache import cache
+
+from .models import Ingredient
+
+INDEX_VERSION_KEY = 'ingredient_index:version'
+
+
+def normalize(value):
+    return value.lower().replace('ё', 'е')
+
+
+class IngredientIndex:
+    """
+    Process-local sorted index of ingredient names used for
+    autocomplete. Built lazily from the database and rebuilt after
+    the shared version key changes, so every worker picks up
+    invalidations when a shared cache backend is configured.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._version = None
+        self._keys = []
+        self._entries = []
+
+    def invalidate(self):
+        cache.set(INDEX_VERSION_KEY, uuid4().hex, timeout=None)
+
+    def _current_version(self):
+        version = cache.get(INDEX_VERSION_KEY)
+        if version is None:
+            cache.add(INDEX_VERSION_KEY, uuid4().hex, timeout=None)
+            version = cache.get(INDEX_VERSION_KEY)
+        return version
+
+    def _load(self):
+        version = self._current_version()
+        with self._lock:
+            if self._version != version:
+                # Distinct names may normalize to the same key, so
+                # ties are broken by id: instances do not compare.
+                entries = sorted(
+                    (
+                        (normalize(ingredient.name), ingredient)
+                        for ingredient in Ingredient.objects.only(
+                            'id', 'name', 'measurement_unit'
+                        ).iterator()
+                    ),
+                    key=lambda entry: (entry[0], entry[1].id)
+                )
+                self._keys = [key for key, _ in entries]
+                self._entries = [ingredient for _, ingredient in entries]
+                self._version = version
+            return self._keys, self._entries
+
+    def search(self, query, limit):
+        """
+        Returns up to 'limit' ingredients whose names start with
+        the query, followed by those containing it elsewhere.
+        """
+        keys, entries = self._load()
+        query = normalize(query)
+        start = bisect_left(keys, query)
+        end = bisect_left(keys, query + '￿', lo=start)
+        results = entries[start:min(end, start + limit)]
+        if len(results) < limit:
+            for key, ingredient in zip(keys, entries):
+                if query in key and not key.startswith(query):
+                    results.append(ingredient)
+                    if len(results) == limit:
+                        break
+        return results
+
+
+ingredient_index = IngredientIndex()
@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+
+from recipes.images import needs_renditions, process_recipe_image
+from recipes.models import Recipe
+
+
+class Command(BaseCommand):
+    help = ('Создаёт уменьшенные копии изображений рецептов, '
+            'у которых их ещё нет')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--force', action='store_true',
+            help='Обработать все рецепты, создав недостающие копии'
+        )
+
+    def handle(self, *args, **options):
+        recipes = Recipe.objects.exclude(image='').only(
+            'id', 'image', 'image_renditions'
+        )
+        names = {
+            recipe.image.name for recipe in recipes.iterator()
+            if options['force'] or needs_renditions(recipe)
+        }
+        for name in sorted(names):
+            process_recipe_image(name)
+        self.stdout.write(self.style.SUCCESS(
+            f'Обработано изображений: {len(names)}'
+        ))
@@ -0,0 +1,76 @@
+import posixpath
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from recipes.images import process_recipe_image, release_image
+from recipes.models import Recipe
+
+
+class Command(BaseCommand):
+    help = ('Переименовывает изображения рецептов по хешу содержимого, '
+            'оставляя одну копию одинаковых файлов')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--delete-orphans', action='store_true',
+            help='Удалить файлы, на которые не ссылается ни один рецепт'
+        )
+
+    def handle(self, *args, **options):
+        field = Recipe._meta.get_field('image')
+        storage = field.storage
+        names = Recipe.objects.exclude(image='').values_list(
+            'image', flat=True
+        ).distinct()
+        renamed = 0
+        for name in list(names):
+            if not storage.exists(name):
+                self.stderr.write(f'Файл не найден: {name}')
+                continue
+            if self.rename(storage, name):
+                renamed += 1
+        if options['delete_orphans']:
+            self.delete_orphans(storage, field.upload_to)
+        call_command('build_image_renditions', stdout=self.stdout)
+        self.stdout.write(self.style.SUCCESS(
+            f'Переименовано изображений: {renamed}'
+        ))
+
+    @transaction.atomic
+    def rename(self, storage, name):
+        """
+        Points the recipes at the content-addressed copy. The old file
+        is released and the renditions of the copy are built once the
+        update is committed, so a rollback leaves the rows pointing at
+        files that still exist.
+        """
+        with storage.open(name) as file:
+            content_name = storage.save(name, file)
+        if content_name == name:
+            return False
+        recipes = Recipe.objects.filter(image=name)
+        renditions = recipes.values_list(
+            'image_renditions', flat=True
+        ).first()
+        recipes.update(image=content_name, image_renditions={})
+        transaction.on_commit(lambda: release_image(name, renditions))
+        transaction.on_commit(lambda: process_recipe_image(content_name))
+        return True
+
+    def delete_orphans(self, storage, directory):
+        referenced = set()
+        for name, renditions in Recipe.objects.values_list(
+            'image', 'image_renditions'
+        ):
+            referenced.add(name)
+            for formats in renditions.get('files', {}).values():
+                referenced.update(formats.values())
+        _, files = storage.listdir(directory)
+        deleted = 0
+        for filename in files:
+            name = posixpath.join(directory.rstrip('/'), filename)
+            if name not in referenced and release_image(name, {}):
+                deleted += 1
+        self.stdout.write(f'Удалено файлов без ссылок: {deleted}')
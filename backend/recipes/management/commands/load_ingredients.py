@@ -0,0 +1,177 @@
+import csv
+import io
+import json
+import os
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from recipes.indexes import ingredient_index
+from recipes.models import Ingredient
+
+JSON_CHUNK_SIZE = 64 * 1024
+
+
+def read_csv(file):
+    for row in csv.reader(file):
+        if len(row) >= 2:
+            yield row[0], row[1]
+
+
+def read_json(file):
+    """
+    Streams objects of a top-level JSON array without loading the
+    whole document into memory.
+    """
+    decoder = json.JSONDecoder()
+    buffer = ''
+    position = 0
+    started = False
+    for chunk in iter(lambda: file.read(JSON_CHUNK_SIZE), ''):
+        buffer = buffer[position:] + chunk
+        position = 0
+        while True:
+            while position < len(buffer) and buffer[position] in ' \t\r\n,':
+                position += 1
+            if not started and position < len(buffer):
+                if buffer[position] != '[':
+                    raise CommandError('Ожидается JSON-массив объектов.')
+                started = True
+                position += 1
+                continue
+            if position < len(buffer) and buffer[position] == ']':
+                return
+            try:
+                item, position = decoder.raw_decode(buffer, position)
+            except ValueError:
+                break
+            yield read_item(item)
+    raise CommandError('JSON-массив не завершён.')
+
+
+def read_item(item):
+    try:
+        name, measurement_unit = item['title'], item['dimension']
+    except (KeyError, TypeError):
+        name = measurement_unit = None
+    if not isinstance(name, str) or not isinstance(measurement_unit, str):
+        raise CommandError(
+            f'Ожидается объект со строками title и dimension: {item!r:.200}'
+        )
+    return name, measurement_unit
+
+
+def batches(rows, size):
+    batch = {}
+    for name, measurement_unit in rows:
+        name = name.strip()
+        if name:
+            batch[name] = measurement_unit.strip()
+        if len(batch) >= size:
+            yield batch
+            batch = {}
+    if batch:
+        yield batch
+
+
+class Command(BaseCommand):
+    help = ('Загружает справочник ингредиентов из CSV или JSON. '
+            'Повторный запуск обновляет единицы измерения существующих '
+            'ингредиентов')
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Путь к CSV или JSON файлу')
+        parser.add_argument(
+            '--format', choices=('csv', 'json'),
+            help='Формат файла, по умолчанию определяется по расширению'
+        )
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument(
+            '--no-copy', action='store_true',
+            help='Не использовать COPY на PostgreSQL'
+        )
+
+    def handle(self, *args, **options):
+        path = options['path']
+        file_format = (options['format']
+                       or os.path.splitext(path)[1].lstrip('.').lower())
+        readers = {'csv': read_csv, 'json': read_json}
+        if file_format not in readers:
+            raise CommandError(f'Неизвестный формат файла: {file_format}')
+        if connection.vendor == 'postgresql':
+            write = (self.upsert_insert if options['no_copy']
+                     else self.upsert_copy)
+        else:
+            write = self.upsert_orm
+        started = time.monotonic()
+        total = 0
+        try:
+            with open(path, encoding='utf-8', newline='') as file:
+                for batch in batches(
+                    readers[file_format](file), options['batch_size']
+                ):
+                    with transaction.atomic():
+                        write(batch)
+                    total += len(batch)
+        except OSError as error:
+            raise CommandError(error)
+        ingredient_index.invalidate()
+        elapsed = max(time.monotonic() - started, 1e-6)
+        self.stdout.write(self.style.SUCCESS(
+            f'Загружено {total} ингредиентов за {elapsed:.2f} с '
+            f'({total / elapsed:.0f} строк/с)'
+        ))
+
+    def upsert_copy(self, batch):
+        table = Ingredient._meta.db_table
+        buffer = io.StringIO()
+        csv.writer(buffer, quoting=csv.QUOTE_ALL).writerows(batch.items())
+        buffer.seek(0)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'CREATE TEMP TABLE IF NOT EXISTS ingredient_import '
+                '(name varchar(200), measurement_unit varchar(20)) '
+                'ON COMMIT DELETE ROWS'
+            )
+            cursor.cursor.copy_expert(
+                'COPY ingredient_import (name, measurement_unit) '
+                'FROM STDIN WITH (FORMAT csv)', buffer
+            )
+            cursor.execute(
+                f'INSERT INTO {table} (name, measurement_unit) '
+                'SELECT name, measurement_unit FROM ingredient_import '
+                'ON CONFLICT (name) DO UPDATE '
+                'SET measurement_unit = EXCLUDED.measurement_unit '
+                f'WHERE {table}.measurement_unit '
+                'IS DISTINCT FROM EXCLUDED.measurement_unit'
+            )
+
+    def upsert_insert(self, batch):
+        table = Ingredient._meta.db_table
+        values = ', '.join(['(%s, %s)'] * len(batch))
+        params = [value for row in batch.items() for value in row]
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'INSERT INTO {table} (name, measurement_unit) '
+                f'VALUES {values} '
+                'ON CONFLICT (name) DO UPDATE '
+                'SET measurement_unit = EXCLUDED.measurement_unit '
+                f'WHERE {table}.measurement_unit '
+                'IS DISTINCT FROM EXCLUDED.measurement_unit',
+                params
+            )
+
+    def upsert_orm(self, batch):
+        existing = Ingredient.objects.in_bulk(list(batch), field_name='name')
+        Ingredient.objects.bulk_create(
+            [Ingredient(name=name, measurement_unit=unit)
+             for name, unit in batch.items() if name not in existing],
+            ignore_conflicts=True
+        )
+        changed = []
+        for name, ingredient in existing.items():
+            if ingredient.measurement_unit != batch[name]:
+                ingredient.measurement_unit = batch[name]
+                changed.append(ingredient)
+        Ingredient.objects.bulk_update(changed, ['measurement_unit'])
@@ -0,0 +1,53 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from recipes.counters import count_subquery
+from recipes.models import Favorite, Recipe, ShoppingCart, User
+from users.models import Follow
+
+COUNTERS = (
+    (Recipe, {
+        'favorites_count': (Favorite, 'recipe'),
+        'in_carts_count': (ShoppingCart, 'recipe'),
+    }),
+    (User, {
+        'recipes_count': (Recipe, 'author'),
+        'followers_count': (Follow, 'author'),
+    }),
+)
+
+
+class Command(BaseCommand):
+    help = ('Пересчитывает счётчики избранного, корзин, рецептов '
+            'и подписчиков')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Количество строк, обновляемых в одной транзакции'
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        for model, counters in COUNTERS:
+            values = {
+                field: count_subquery(related_model, related_field)
+                for field, (related_model, related_field) in counters.items()
+            }
+            total = self.recount(model, values, batch_size)
+            self.stdout.write(self.style.SUCCESS(
+                f'{model._meta.verbose_name_plural}: обновлено {total}'
+            ))
+
+    def recount(self, model, values, batch_size):
+        total = 0
+        last_pk = 0
+        while True:
+            pks = list(model.objects.filter(pk__gt=last_pk).order_by(
+                'pk'
+            ).values_list('pk', flat=True)[:batch_size])
+            if not pks:
+                return total
+            with transaction.atomic():
+                total += model.objects.filter(pk__in=pks).update(**values)
+            last_pk = pks[-1]
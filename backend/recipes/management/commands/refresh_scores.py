@@ -0,0 +1,102 @@
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, F
+from django.db.models.functions import TruncHour
+from django.utils import timezone
+
+from recipes.models import Favorite, Recipe, RecipeScore, ShoppingCart
+
+
+class Command(BaseCommand):
+    help = ('Обновляет рейтинги популярности и трендов рецептов. '
+            'Пересчитываются только рецепты, рейтинг которых устарел; '
+            'недостающие рейтинги создаются')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days', type=int, default=settings.TRENDING_DAYS,
+            help='Окно в днях для расчёта трендов'
+        )
+        parser.add_argument(
+            '--half-life', type=float,
+            default=settings.TRENDING_HALF_LIFE_DAYS,
+            help='Период полураспада веса события в днях'
+        )
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        now = timezone.now()
+        trending = self.get_trending(
+            now, options['days'], options['half_life']
+        )
+        recipe_ids = set(trending)
+        recipe_ids.update(RecipeScore.objects.filter(
+            trending__gt=0
+        ).values_list('recipe_id', flat=True))
+        recipe_ids.update(Recipe.objects.annotate(
+            popularity=F('favorites_count') + F('in_carts_count')
+        ).exclude(score__popular=F('popularity')).values_list(
+            'id', flat=True
+        ))
+        recipe_ids = sorted(recipe_ids)
+        batch_size = options['batch_size']
+        for start in range(0, len(recipe_ids), batch_size):
+            self.save_scores(
+                recipe_ids[start:start + batch_size], trending, now
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f'Обновлено рейтингов: {len(recipe_ids)}'
+        ))
+
+    def get_trending(self, now, days, half_life):
+        """
+        Sums favorites and cart additions of the last 'days' days
+        in hourly buckets, each weighted by exponential time decay.
+        """
+        trending = defaultdict(float)
+        weights = (
+            (Favorite, settings.TRENDING_FAVORITE_WEIGHT),
+            (ShoppingCart, settings.TRENDING_CART_WEIGHT),
+        )
+        for model, weight in weights:
+            events = model.objects.filter(
+                when_added__gte=now - timedelta(days=days)
+            ).annotate(hour=TruncHour('when_added')).order_by().values(
+                'recipe_id', 'hour'
+            ).annotate(total=Count('id'))
+            for event in events.iterator():
+                age = (now - event['hour']).total_seconds() / 86400
+                trending[event['recipe_id']] += (
+                    weight * event['total'] * 0.5 ** (age / half_life)
+                )
+        return trending
+
+    @transaction.atomic
+    def save_scores(self, recipe_ids, trending, now):
+        popular = dict(Recipe.objects.filter(id__in=recipe_ids).annotate(
+            popularity=F('favorites_count') + F('in_carts_count')
+        ).values_list('id', 'popularity'))
+        existing = set(RecipeScore.objects.filter(
+            recipe_id__in=popular
+        ).values_list('recipe_id', flat=True))
+        to_create = []
+        to_update = []
+        for recipe_id, popularity in popular.items():
+            score = RecipeScore(
+                recipe_id=recipe_id,
+                popular=popularity,
+                trending=trending.get(recipe_id, 0),
+                updated_at=now
+            )
+            if recipe_id in existing:
+                to_update.append(score)
+            else:
+                to_create.append(score)
+        RecipeScore.objects.bulk_create(to_create)
+        RecipeScore.objects.bulk_update(
+            to_update, ['popular', 'trending', 'updated_at']
+        )
@@ -0,0 +1,309 @@
+import base64
+import io
+import json
+import math
+import time
+import tracemalloc
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Count
+from django.http.response import HttpResponseBase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from PIL import Image
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from recipes.caches import bump_cart_generation
+from recipes.images import release_image
+from recipes.indexes import ingredient_index
+from recipes.models import Ingredient, Recipe, Tag, User
+from recipes.paginators import KeysetPaginator
+
+from .seed_benchmark import DISHES, cart_username
+
+BENCHMARK_RECIPE_NAME = 'Рецепт нагрузочного теста'
+SEARCH_QUERY = DISHES[1]
+# A typo of SEARCH_QUERY: full text finds nothing, the trigram
+# fallback does.
+SEARCH_TYPO = 'салянка'
+
+
+def percentile(values, percent):
+    ordered = sorted(values)
+    rank = max(0, math.ceil(percent / 100 * len(ordered)) - 1)
+    return ordered[rank]
+
+
+def read_response(response):
+    """
+    Reads a whole response; cases that call code directly return
+    their result as is.
+    """
+    if not isinstance(response, HttpResponseBase):
+        return response
+    if response.streaming:
+        return b''.join(response.streaming_content)
+    return response.content
+
+
+class Command(BaseCommand):
+    help = ('Прогоняет основные эндпоинты API через тестовый клиент '
+            'Django и сохраняет задержки, число запросов и пиковую '
+            'память в JSON-отчёт')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=20)
+        parser.add_argument('--output', default='benchmark.json')
+        parser.add_argument('--label', default='',
+                            help='Метка прогона, например хеш коммита')
+        parser.add_argument('--user', help='Email пользователя для запросов')
+        parser.add_argument('--deep-page', type=int, default=5000,
+                            help='Номер дальней страницы списка рецептов')
+        parser.add_argument('--cart-sizes', type=int, nargs='+',
+                            default=[10, 100, 1000],
+                            help='Размеры корзин, созданных seed_benchmark')
+
+    def handle(self, *args, **options):
+        if 'testserver' not in settings.ALLOWED_HOSTS:
+            settings.ALLOWED_HOSTS = [*settings.ALLOWED_HOSTS, 'testserver']
+        user = self.get_user(options['user'])
+        self.client = self.get_client(user)
+        self.iterations = options['iterations']
+        ingredient = Ingredient.objects.order_by('id').first()
+        prefix = ingredient.name[:2] if ingredient else 'а'
+        limit = settings.INGREDIENT_SEARCH_LIMIT
+        deep_page, deep_cursor = self.get_deep_page(options['deep_page'])
+
+        results = {
+            'recipes_list': self.measure(
+                lambda: self.client.get('/api/recipes/', {'limit': 6})
+            ),
+            'recipes_list_cursor': self.measure(
+                lambda: self.client.get(
+                    '/api/recipes/', {'pagination': 'cursor', 'limit': 6}
+                )
+            ),
+            'recipes_list_deep_page': self.measure(
+                lambda: self.client.get(
+                    '/api/recipes/', {'page': deep_page, 'limit': 6}
+                )
+            ),
+            'recipes_list_cursor_deep_page': self.measure(
+                lambda: self.client.get('/api/recipes/', {
+                    'pagination': 'cursor', 'limit': 6,
+                    'cursor': deep_cursor or '',
+                })
+            ),
+            'recipes_search': self.measure(
+                lambda: self.client.get(
+                    '/api/recipes/', {'search': SEARCH_QUERY, 'limit': 6}
+                )
+            ),
+            'recipes_search_typo': self.measure(
+                lambda: self.client.get(
+                    '/api/recipes/', {'search': SEARCH_TYPO, 'limit': 6}
+                )
+            ),
+            'download_shopping_cart': self.measure(
+                lambda: self.client.get(
+                    '/api/recipes/download_shopping_cart/'
+                ),
+                setup=lambda: bump_cart_generation([user.id])
+            ),
+            'download_shopping_cart_cached': self.measure(
+                lambda: self.client.get(
+                    '/api/recipes/download_shopping_cart/'
+                )
+            ),
+            'subscriptions': self.measure(
+                lambda: self.client.get('/api/users/subscriptions/')
+            ),
+            'ingredients_autocomplete': self.measure(
+                lambda: self.client.get('/api/ingredients/', {'name': prefix})
+            ),
+            'ingredients_index_search': self.measure(
+                lambda: ingredient_index.search(prefix, limit)
+            ),
+            'ingredients_db_istartswith': self.measure(
+                lambda: list(Ingredient.objects.filter(
+                    name__istartswith=prefix
+                )[:limit])
+            ),
+            'ingredients_db_icontains': self.measure(
+                lambda: list(Ingredient.objects.filter(
+                    name__icontains=prefix
+                )[:limit])
+            ),
+            'recipe_create': self.measure_rolled_back(
+                lambda: self.client.post(
+                    '/api/recipes/', self.get_recipe_payload(), format='json'
+                )
+            ),
+        }
+        for size in options['cart_sizes']:
+            results.update(self.measure_shopping_list(size))
+        report = {
+            'label': options['label'],
+            'created': timezone.now().isoformat(),
+            'database': connection.vendor,
+            'iterations': self.iterations,
+            'deep_page': deep_page,
+            'user': user.email,
+            'results': results,
+        }
+        with open(options['output'], 'w', encoding='utf-8') as file:
+            json.dump(report, file, ensure_ascii=False, indent=2)
+        for name, result in results.items():
+            self.stdout.write(
+                f"{name:42} p50 {result['p50_ms']:8.2f} ms  "
+                f"p95 {result['p95_ms']:8.2f} ms  "
+                f"queries {result['queries']:4}  "
+                f"memory {result['peak_memory_kb']:8.1f} KB"
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f"Отчёт сохранён в {options['output']}"
+        ))
+
+    def get_user(self, email):
+        if email:
+            user = User.objects.filter(email=email).first()
+        else:
+            user = User.objects.exclude(
+                username__regex=r'_cart_\d+$'
+            ).annotate(
+                cart_size=Count('shopping_cart')
+            ).order_by('-cart_size', '-followers_count').first()
+        if user is None:
+            raise CommandError(
+                'Пользователь не найден, сначала выполните seed_benchmark.'
+            )
+        return user
+
+    def get_client(self, user):
+        token, _ = Token.objects.get_or_create(user=user)
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+        return client
+
+    def measure_shopping_list(self, size):
+        """
+        Measures the shopping list download of the seeded user with
+        'size' recipes in the cart: built after the cart generation is
+        bumped, served from the cache, and answered with 304 to a
+        matching If-None-Match.
+        """
+        user = User.objects.filter(
+            username__endswith=f'_{cart_username(size)}'
+        ).order_by('-id').first()
+        if user is None:
+            self.stderr.write(
+                f'Нет пользователя с корзиной из {size} рецептов, '
+                f'выполните seed_benchmark --cart-sizes {size}'
+            )
+            return {}
+        client = self.get_client(user)
+        url = '/api/recipes/download_shopping_cart/'
+        name = f'download_shopping_cart_{size}'
+        results = {
+            name: self.measure(
+                lambda: client.get(url),
+                setup=lambda: bump_cart_generation([user.id])
+            ),
+            f'{name}_cached': self.measure(lambda: client.get(url)),
+        }
+        response = client.get(url)
+        read_response(response)
+        results[f'{name}_not_modified'] = self.measure(
+            lambda: client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        )
+        return results
+
+    def get_deep_page(self, page, page_size=6):
+        """
+        Returns the deep page number, capped to the last page, and
+        the cursor that starts the same page, so both paginations
+        are measured at one depth.
+        """
+        total = Recipe.objects.count()
+        page = max(1, min(page, math.ceil(total / page_size)))
+        if page == 1:
+            return page, None
+        last = Recipe.objects.order_by('-pub_date', '-id')[
+            (page - 1) * page_size - 1
+        ]
+        return page, KeysetPaginator().get_cursor(False, last)
+
+    def get_recipe_payload(self):
+        buffer = io.BytesIO()
+        Image.new('RGB', (64, 64), 'orange').save(buffer, 'PNG')
+        image = base64.b64encode(buffer.getvalue()).decode()
+        ingredients = Ingredient.objects.values_list('id', flat=True)[:10]
+        return {
+            'name': BENCHMARK_RECIPE_NAME,
+            'text': 'Создан командой run_benchmark',
+            'cooking_time': 10,
+            'image': f'data:image/png;base64,{image}',
+            'tags': list(Tag.objects.values_list('id', flat=True)[:2]),
+            'ingredients': [
+                {'id': ingredient_id, 'amount': 10}
+                for ingredient_id in ingredients
+            ],
+        }
+
+    def measure_rolled_back(self, request):
+        """
+        Measures a request that creates recipes inside a transaction
+        that is rolled back, so no recipes are left behind and their
+        on-commit work (renditions, feed fan-out) never runs. Image
+        files are not transactional, so stored images no recipe
+        references are deleted afterwards.
+        """
+        with transaction.atomic():
+            result = self.measure(request)
+            images = set(Recipe.objects.filter(
+                name=BENCHMARK_RECIPE_NAME
+            ).values_list('image', flat=True))
+            transaction.set_rollback(True)
+        for image in images:
+            release_image(image, {})
+        return result
+
+    def measure(self, request, setup=None):
+        """
+        Runs the request once to warm up, then 'iterations' times
+        measuring latency and queries, then once more under
+        tracemalloc to record peak memory.
+        """
+        if setup:
+            setup()
+        read_response(request())
+        timings = []
+        queries = []
+        status_code = None
+        for _ in range(self.iterations):
+            if setup:
+                setup()
+            with CaptureQueriesContext(connection) as context:
+                started = time.perf_counter()
+                response = request()
+                read_response(response)
+                timings.append((time.perf_counter() - started) * 1000)
+            queries.append(len(context.captured_queries))
+            status_code = getattr(response, 'status_code', None)
+        if setup:
+            setup()
+        tracemalloc.start()
+        read_response(request())
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        return {
+            'status': status_code,
+            'p50_ms': round(percentile(timings, 50), 3),
+            'p95_ms': round(percentile(timings, 95), 3),
+            'mean_ms': round(sum(timings) / len(timings), 3),
+            'queries': max(queries),
+            'peak_memory_kb': round(peak / 1024, 1),
+        }
@@ -0,0 +1,194 @@
+import random
+from uuid import uuid4
+
+from django.contrib.auth.hashers import make_password
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from recipes.feed import backfill_follow
+from recipes.models import (Favorite, Ingredient, IngredientInRecipe, Recipe,
+                            ShoppingCart, Tag, TagsInRecipe, User)
+from users.models import Follow
+
+BENCHMARK_PASSWORD = 'benchmark'
+BENCHMARK_IMAGE = 'recipes/images/benchmark.jpg'
+# Recipe names are short dish names, so run_benchmark can search them
+# by full text and, with a typo, by trigram similarity.
+DISHES = (
+    'борщ', 'солянка', 'плов', 'омлет', 'сырники', 'пельмени', 'блины',
+    'окрошка', 'шарлотка', 'рагу', 'гуляш', 'котлеты', 'винегрет',
+    'запеканка', 'уха', 'щи', 'оладьи', 'голубцы', 'вареники', 'шашлык',
+)
+
+
+def cart_username(size):
+    return f'cart_{size}'
+
+
+class Command(BaseCommand):
+    help = ('Заполняет базу синтетическими пользователями, подписками, '
+            'рецептами, избранным и корзинами для нагрузочных тестов')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=100)
+        parser.add_argument('--follows', type=int, default=10,
+                            help='Подписок на пользователя')
+        parser.add_argument('--recipes', type=int, default=1000)
+        parser.add_argument('--ingredients', type=int, default=8,
+                            help='Ингредиентов в рецепте')
+        parser.add_argument('--favorites', type=int, default=20,
+                            help='Рецептов в избранном у пользователя')
+        parser.add_argument('--cart', type=int, default=10,
+                            help='Рецептов в корзине у пользователя')
+        parser.add_argument('--cart-sizes', type=int, nargs='+',
+                            default=[10, 100, 1000],
+                            help='Размеры корзин отдельных пользователей '
+                                 'для замера выгрузки списка покупок')
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--seed', type=int, default=None)
+
+    def handle(self, *args, **options):
+        self.random = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+        prefix = uuid4().hex[:8]
+        with transaction.atomic():
+            tags = self.get_tags()
+            ingredients = list(Ingredient.objects.values_list('id', flat=True))
+            if not ingredients:
+                ingredients = self.create_ingredients(prefix, 200)
+            users = self.create_users(prefix, options['users'])
+            follows = self.create_follows(users, options['follows'])
+            recipes = self.create_recipes(
+                prefix, users, tags, ingredients,
+                options['recipes'], options['ingredients']
+            )
+            self.create_relations(Favorite, users, recipes,
+                                  options['favorites'])
+            self.create_relations(ShoppingCart, users, recipes,
+                                  options['cart'])
+            self.create_cart_users(prefix, recipes, options['cart_sizes'])
+        for follow in follows:
+            backfill_follow(follow)
+        call_command('recount', batch_size=self.batch_size,
+                     stdout=self.stdout)
+        call_command('refresh_scores', batch_size=self.batch_size,
+                     stdout=self.stdout)
+        self.stdout.write(self.style.SUCCESS(
+            f'Создано: пользователей {len(users)}, подписок {len(follows)}, '
+            f'рецептов {len(recipes)}. Пароль пользователей: '
+            f'{BENCHMARK_PASSWORD}, префикс: bench_{prefix}'
+        ))
+
+    def bulk_create(self, model, objects):
+        return model.objects.bulk_create(objects, batch_size=self.batch_size)
+
+    def get_tags(self):
+        tags = list(Tag.objects.values_list('id', flat=True))
+        if tags:
+            return tags
+        self.bulk_create(Tag, [
+            Tag(name=name, hexcolor=color, slug=f'tag{index}')
+            for index, (color, name) in enumerate(Tag.COLOR_CHOICES)
+        ])
+        return list(Tag.objects.values_list('id', flat=True))
+
+    def create_ingredients(self, prefix, total):
+        self.bulk_create(Ingredient, [
+            Ingredient(name=f'bench_{prefix}_{index}', measurement_unit='г')
+            for index in range(total)
+        ])
+        return list(Ingredient.objects.filter(
+            name__startswith=f'bench_{prefix}_'
+        ).values_list('id', flat=True))
+
+    def create_users(self, prefix, total):
+        password = make_password(BENCHMARK_PASSWORD)
+        self.bulk_create(User, [
+            User(
+                email=f'bench_{prefix}_{index}@example.com',
+                username=f'bench_{prefix}_{index}',
+                first_name='Bench',
+                last_name=str(index),
+                password=password,
+            )
+            for index in range(total)
+        ])
+        return list(User.objects.filter(
+            username__startswith=f'bench_{prefix}_'
+        ))
+
+    def create_cart_users(self, prefix, recipes, sizes):
+        """
+        Adds a user per size with that many recipes in the shopping
+        cart, found by run_benchmark through the username suffix.
+        """
+        password = make_password(BENCHMARK_PASSWORD)
+        self.bulk_create(User, [
+            User(
+                email=f'bench_{prefix}_{cart_username(size)}@example.com',
+                username=f'bench_{prefix}_{cart_username(size)}',
+                first_name='Bench',
+                last_name=cart_username(size),
+                password=password,
+            )
+            for size in sizes
+        ])
+        for size in sizes:
+            user = User.objects.get(
+                username=f'bench_{prefix}_{cart_username(size)}'
+            )
+            self.create_relations(ShoppingCart, [user], recipes, size)
+
+    def create_follows(self, users, per_user):
+        follows = []
+        for user in users:
+            authors = self.random.sample(
+                users, min(per_user + 1, len(users))
+            )
+            follows.extend(
+                Follow(user=user, author=author)
+                for author in authors if author != user
+            )
+        return self.bulk_create(Follow, follows)
+
+    def create_recipes(self, prefix, users, tags, ingredients,
+                       total, per_recipe):
+        self.bulk_create(Recipe, [
+            Recipe(
+                author=self.random.choice(users),
+                name=f'{self.random.choice(DISHES)} {index}',
+                text='Синтетический рецепт для нагрузочного теста',
+                cooking_time=self.random.randint(5, 120),
+                image=BENCHMARK_IMAGE,
+            )
+            for index in range(total)
+        ])
+        recipes = list(Recipe.objects.filter(
+            author__username__startswith=f'bench_{prefix}_'
+        ).only('id'))
+        self.bulk_create(IngredientInRecipe, [
+            IngredientInRecipe(
+                recipe=recipe, ingredient_id=ingredient_id,
+                amount=self.random.randint(1, 500)
+            )
+            for recipe in recipes
+            for ingredient_id in self.random.sample(
+                ingredients, min(per_recipe, len(ingredients))
+            )
+        ])
+        self.bulk_create(TagsInRecipe, [
+            TagsInRecipe(recipe=recipe, tag_id=tag_id)
+            for recipe in recipes
+            for tag_id in self.random.sample(tags, self.random.randint(1, 2))
+        ])
+        return recipes
+
+    def create_relations(self, model, users, recipes, per_user):
+        self.bulk_create(model, [
+            model(user=user, recipe=recipe)
+            for user in users
+            for recipe in self.random.sample(
+                recipes, min(per_user, len(recipes))
+            )
+        ])
@@ -0,0 +1,46 @@
+# Generated by Django 3.2.5 on 2026-10-18 18:52
+
+from django.db import migrations, models
+from django.db.models import F
+
+BATCH_SIZE = 1000
+
+
+def create_missing_scores(apps, schema_editor):
+    Recipe = apps.get_model('recipes', 'Recipe')
+    RecipeScore = apps.get_model('recipes', 'RecipeScore')
+    recipes = Recipe.objects.filter(score__isnull=True).annotate(
+        popularity=F('favorites_count') + F('in_carts_count')
+    ).values_list('id', 'popularity')
+    RecipeScore.objects.bulk_create(
+        (RecipeScore(recipe_id=recipe_id, popular=popularity)
+         for recipe_id, popularity in recipes.iterator()),
+        batch_size=BATCH_SIZE
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0010_content_addressed_images'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_missing_scores, migrations.RunPython.noop),
+        migrations.RemoveIndex(
+            model_name='recipescore',
+            name='score_popular_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='recipescore',
+            name='score_trending_idx',
+        ),
+        migrations.AddIndex(
+            model_name='recipescore',
+            index=models.Index(fields=['-popular', '-recipe'], name='score_popular_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='recipescore',
+            index=models.Index(fields=['-trending', '-recipe'], name='score_trending_idx'),
+        ),
+    ]
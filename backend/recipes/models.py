@@ -1,6 +1,16 @@
 from django.contrib.auth import get_user_model
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
 from django.core.validators import MinValueValidator
 from django.db import models
+from django.db.models import Exists, F, OuterRef, Prefetch, Window
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import RowNumber
+
+from users.models import Follow
+
+from .counters import CounterFieldsMixin
+from .storage import content_addressed_storage
 
 User = get_user_model()
 
@@ -66,7 +76,65 @@ class Ingredient(models.Model):
         return self.name
 
 
-class Recipe(models.Model):
+class RecipeQuerySet(models.QuerySet):
+
+    def with_related(self):
+        """
+        Loads author, tags and ingredients of every recipe with
+        a constant number of queries, whatever the size of the page.
+        """
+        return self.select_related('author').prefetch_related(
+            Prefetch('tags', queryset=Tag.objects.all()),
+            Prefetch(
+                'ingredientinrecipe_set',
+                queryset=IngredientInRecipe.objects.select_related(
+                    'ingredient'
+                )
+            ),
+        )
+
+    def with_user_flags(self, user):
+        """
+        Annotates 'is_favorited', 'is_in_shopping_cart' and
+        'is_author_subscribed' flags for the given user.
+        """
+        if user is None or user.is_anonymous:
+            return self
+        return self.annotate(
+            is_favorited=Exists(Favorite.objects.filter(
+                user=user, recipe=OuterRef('pk')
+            )),
+            is_in_shopping_cart=Exists(ShoppingCart.objects.filter(
+                user=user, recipe=OuterRef('pk')
+            )),
+            is_author_subscribed=Exists(Follow.objects.filter(
+                user=user, author=OuterRef('author')
+            )),
+        )
+
+    def latest_per_author(self, authors, limit):
+        """
+        Keeps the 'limit' newest recipes of every given author,
+        ranked with ROW_NUMBER() OVER (PARTITION BY author) in a
+        single query.
+        """
+        if not authors:
+            return self.none()
+        ranked = self.model.objects.filter(author__in=authors).annotate(
+            row_number=Window(
+                expression=RowNumber(),
+                partition_by=[F('author')],
+                order_by=F('pub_date').desc()
+            )
+        ).order_by().values('pk', 'row_number')
+        sql, params = ranked.query.sql_with_params()
+        return self.filter(pk__in=RawSQL(
+            f'SELECT "id" FROM ({sql}) ranked WHERE ranked.row_number <= %s',
+            (*params, limit)
+        ))
+
+
+class Recipe(CounterFieldsMixin, models.Model):
     author = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
@@ -97,13 +165,53 @@ class Recipe(models.Model):
     )
     image = models.ImageField(
         upload_to='recipes/images/',
+        storage=content_addressed_storage,
         verbose_name='Изображение',
     )
+    image_renditions = models.JSONField(
+        default=dict,
+        editable=False,
+        verbose_name='Уменьшенные копии изображения'
+    )
+    favorites_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Добавлений в избранное'
+    )
+    in_carts_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Добавлений в корзину'
+    )
+    search_vector = SearchVectorField(
+        null=True,
+        editable=False,
+        verbose_name='Поисковый вектор'
+    )
+
+    objects = RecipeQuerySet.as_manager()
+
+    counter_fields = ('favorites_count', 'in_carts_count')
 
     class Meta:
         ordering = ['-pub_date']
         verbose_name = 'Рецепт'
         verbose_name_plural = 'Рецепты'
+        indexes = [
+            models.Index(
+                fields=['-pub_date', '-id'], name='recipe_pub_date_id_idx'
+            ),
+            models.Index(
+                fields=['author', '-pub_date', '-id'],
+                name='recipe_author_pub_date_idx'
+            ),
+            GinIndex(fields=['search_vector'], name='recipe_search_idx'),
+            GinIndex(
+                fields=['name'],
+                opclasses=['gin_trgm_ops'],
+                name='recipe_name_trgm_idx'
+            ),
+        ]
 
     def __str__(self):
         return self.name
@@ -177,6 +285,11 @@ class Favorite(models.Model):
                 fields=['user', 'recipe'], name='unique_favorite'
             )
         ]
+        indexes = [
+            models.Index(
+                fields=['user', '-when_added'], name='favorite_user_added_idx'
+            ),
+        ]
 
     def __str__(self):
         return f'{self.user} added {self.recipe}'
@@ -207,6 +320,87 @@ class ShoppingCart(models.Model):
                 fields=['user', 'recipe'], name='unique_shopping_cart'
             )
         ]
+        indexes = [
+            models.Index(
+                fields=['user', '-when_added'], name='cart_user_added_idx'
+            ),
+        ]
 
     def __str__(self):
         return f'{self.user} added {self.recipe}'
+
+
+class RecipeScore(models.Model):
+    """
+    Precomputed ranking of a recipe, refreshed by the
+    'refresh_scores' management command. Every recipe has one,
+    created together with the recipe.
+    """
+
+    recipe = models.OneToOneField(
+        Recipe,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='score',
+        verbose_name='Рецепт'
+    )
+    popular = models.FloatField(default=0, verbose_name='Популярность')
+    trending = models.FloatField(default=0, verbose_name='Тренд')
+    updated_at = models.DateTimeField(
+        auto_now=True, verbose_name='Время обновления'
+    )
+
+    class Meta:
+        verbose_name = 'Рейтинг рецепта'
+        verbose_name_plural = 'Рейтинги рецептов'
+        indexes = [
+            models.Index(
+                fields=['-popular', '-recipe'], name='score_popular_idx'
+            ),
+            models.Index(
+                fields=['-trending', '-recipe'], name='score_trending_idx'
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.recipe}: {self.popular} / {self.trending}'
+
+
+class FeedEntry(models.Model):
+    """
+    Recipe of a followed author, written to the follower's feed
+    when the recipe is published.
+    """
+
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='feed_entries',
+        verbose_name='Пользователь'
+    )
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='feed_entries',
+        verbose_name='Рецепт'
+    )
+    pub_date = models.DateTimeField(verbose_name='Время публикации')
+
+    class Meta:
+        ordering = ['-pub_date']
+        verbose_name = 'Запись ленты'
+        verbose_name_plural = 'Записи ленты'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'recipe'], name='unique_feed_entry'
+            )
+        ]
+        indexes = [
+            models.Index(
+                fields=['user', '-pub_date', '-recipe'],
+                name='feed_user_pub_date_idx'
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.recipe} in feed of {self.user}'
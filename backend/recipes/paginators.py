@@ -1,5 +1,289 @@
-from rest_framework.pagination import PageNumberPagination
+import heapq
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from collections import OrderedDict
+
+from django.db import connection, connections
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+from .feed import get_feed_branches
 
 
 class CartPaginator(PageNumberPagination):
     page_size_query_param = 'limit'
+
+
+def approximate_count(queryset):
+    """
+    Returns the row estimate of the PostgreSQL planner for the
+    queryset, which costs no table scan. Other backends fall back
+    to an exact count.
+    """
+    if connection.vendor != 'postgresql':
+        return queryset.count()
+    sql, params = queryset.order_by().query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return plan[0]['Plan']['Plan Rows']
+
+
+class KeysetPaginator(BasePagination):
+    """
+    Cursor pagination over a unique pair of fields. Pages are
+    selected with a 'WHERE (a, b) < (x, y)' style condition served
+    by a composite index instead of OFFSET, so deep pages cost the
+    same as the first one. No COUNT(*) is run unless '?count=1'
+    is passed, in which case the planner estimate is returned.
+    """
+
+    ordering = ('pub_date', 'id')
+    descending = True
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'limit'
+    count_query_param = 'count'
+    page_size = api_settings.PAGE_SIZE
+    max_page_size = 100
+    invalid_cursor_message = 'Неверный курсор.'
+    cursor_parsers = {
+        'pub_date': parse_datetime,
+        'username': str,
+        'id': int,
+    }
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.page_size = self.get_page_size(request)
+        self.count = None
+        if request.query_params.get(self.count_query_param):
+            self.count = self.get_count(queryset)
+        cursor = self.decode_cursor(request)
+        reverse = cursor is not None and cursor[0]
+        results = self.get_results(queryset, cursor, reverse)
+        has_more = len(results) > self.page_size
+        results = results[:self.page_size]
+        if reverse:
+            results.reverse()
+        self.has_next = has_more if not reverse else cursor is not None
+        self.has_previous = has_more if reverse else cursor is not None
+        self.results = results
+        return results
+
+    def get_count(self, queryset):
+        return approximate_count(queryset)
+
+    def get_results(self, queryset, cursor, reverse):
+        return list(self.get_page_queryset(queryset, cursor, reverse))
+
+    def get_page_queryset(self, queryset, cursor, reverse):
+        """
+        Returns the page after the cursor plus one row, which tells
+        whether there is a next page.
+        """
+        queryset = queryset.order_by(*self.get_ordering(reverse))
+        if cursor is not None:
+            queryset = queryset.filter(self.get_position_filter(*cursor))
+        return queryset[:self.page_size + 1]
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return max(1, min(page_size, self.max_page_size))
+
+    def get_ordering(self, reverse):
+        prefix = '-' if self.descending != reverse else ''
+        return [f'{prefix}{field}' for field in self.ordering]
+
+    def get_position_filter(self, reverse, values):
+        """
+        The OR of the two comparisons alone is only applied as a
+        filter while the index is scanned from its start. The
+        redundant bound on the first field becomes the index
+        condition, so the scan starts at the cursor.
+        """
+        lookup = 'lt' if self.descending != reverse else 'gt'
+        first, second = self.ordering
+        return Q(**{f'{first}__{lookup}e': values[0]}) & (
+            Q(**{f'{first}__{lookup}': values[0]})
+            | Q(**{first: values[0], f'{second}__{lookup}': values[1]})
+        )
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            reverse, values = json.loads(urlsafe_b64decode(encoded))
+        except (TypeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(values, list) or len(values) != 2:
+            raise NotFound(self.invalid_cursor_message)
+        return bool(reverse), self.parse_cursor_values(values)
+
+    def parse_cursor_values(self, values):
+        """
+        Converts the cursor values to the types of the ordering
+        fields, so a tampered cursor is rejected here instead of
+        failing inside the query.
+        """
+        parsed = []
+        for field, value in zip(self.ordering, values):
+            try:
+                value = self.cursor_parsers[field](value)
+            except (TypeError, ValueError):
+                value = None
+            if value is None:
+                raise NotFound(self.invalid_cursor_message)
+            parsed.append(value)
+        return parsed
+
+    def get_cursor(self, reverse, instance):
+        values = [str(getattr(instance, field)) if field != 'id'
+                  else instance.id for field in self.ordering]
+        return urlsafe_b64encode(
+            json.dumps([reverse, values]).encode()
+        ).decode()
+
+    def encode_cursor(self, reverse, instance):
+        return replace_query_param(
+            self.base_url, self.cursor_query_param,
+            self.get_cursor(reverse, instance)
+        )
+
+    def get_next_link(self):
+        if not self.has_next or not self.results:
+            return None
+        return self.encode_cursor(False, self.results[-1])
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if not self.results:
+            return remove_query_param(self.base_url, self.cursor_query_param)
+        return self.encode_cursor(True, self.results[0])
+
+    def get_paginated_response(self, data):
+        response = OrderedDict([
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('results', data),
+        ])
+        if self.count is not None:
+            response['count'] = self.count
+            response.move_to_end('count', last=False)
+        return Response(response)
+
+
+class FollowKeysetPaginator(KeysetPaginator):
+    ordering = ('username', 'id')
+    descending = False
+
+
+class FeedKeysetPaginator(KeysetPaginator):
+    """
+    Keyset pagination of the feed of the request user over
+    (feed_date, id). Every branch of the feed is read up to the end
+    of the page through its own index, so a page costs the same
+    wherever it is. With pull-mode authors the ids of the page are
+    taken from a UNION of the limited branches and the recipes are
+    loaded by id.
+    """
+
+    ordering = ('feed_date', 'id')
+    cursor_parsers = {
+        **KeysetPaginator.cursor_parsers,
+        'feed_date': parse_datetime,
+    }
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.branches = get_feed_branches(request.user, queryset)
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_count(self, queryset):
+        return sum(approximate_count(branch) for branch in self.branches)
+
+    def get_results(self, queryset, cursor, reverse):
+        if len(self.branches) == 1:
+            return super().get_results(self.branches[0], cursor, reverse)
+        keys = self.get_page_keys(cursor, reverse)
+        recipes = queryset.in_bulk([recipe_id for _, recipe_id in keys])
+        results = []
+        for feed_date, recipe_id in keys:
+            if recipe_id in recipes:
+                recipe = recipes[recipe_id]
+                recipe.feed_date = feed_date
+                results.append(recipe)
+        return results
+
+    def get_page_keys(self, cursor, reverse):
+        """
+        Returns (feed_date, id) of the page. A recipe of a pull-mode
+        author may also have been fanned out before the author got
+        that many followers, so duplicates are dropped.
+        """
+        pages = [
+            self.get_page_queryset(
+                branch.prefetch_related(None).values_list(*self.ordering),
+                cursor, reverse
+            )
+            for branch in self.branches
+        ]
+        features = connections[pages[0].db].features
+        if features.supports_slicing_ordering_in_compound:
+            return list(pages[0].union(*pages[1:]).order_by(
+                *self.get_ordering(reverse)
+            )[:self.page_size + 1])
+        keys = heapq.merge(*(list(page) for page in pages), reverse=(
+            self.descending != reverse
+        ))
+        return list(dict.fromkeys(keys))[:self.page_size + 1]
+
+
+class KeysetPaginationMixin:
+    """
+    Switches a list view to keyset pagination when the client opts
+    in with '?pagination=cursor'. Page number pagination stays the
+    default for the frontend. Query parameters that order the list
+    by something else than the keyset are rejected in cursor mode.
+    """
+
+    keyset_pagination_class = KeysetPaginator
+    keyset_ordering_params = ()
+    keyset_ordering_message = (
+        'Параметр несовместим с курсорной пагинацией.'
+    )
+
+    @property
+    def paginator(self):
+        if not hasattr(self, '_paginator'):
+            if self.request.query_params.get('pagination') == 'cursor':
+                self._paginator = self.keyset_pagination_class()
+            elif self.pagination_class is None:
+                self._paginator = None
+            else:
+                self._paginator = self.pagination_class()
+        return self._paginator
+
+    def paginate_queryset(self, queryset):
+        if isinstance(self.paginator, KeysetPaginator):
+            conflicts = [
+                param for param in self.keyset_ordering_params
+                if self.request.query_params.get(param)
+            ]
+            if conflicts:
+                raise ValidationError({
+                    param: self.keyset_ordering_message
+                    for param in conflicts
+                })
+        return super().paginate_queryset(queryset)
@@ -0,0 +1,170 @@
+import logging
+import re
+import threading
+import time
+from collections import Counter, defaultdict, deque
+from contextlib import ExitStack, contextmanager
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+_state = threading.local()
+_slow_requests = deque(maxlen=settings.REQUEST_PROFILING_BUFFER_SIZE)
+_slow_requests_lock = threading.Lock()
+
+IN_LIST = re.compile(r'IN \((?:%s, )*%s\)')
+LITERAL = re.compile(r"'(?:[^']|'')*'|\b\d+\b")
+SPACES = re.compile(r'\s+')
+
+
+def fingerprint(sql):
+    """
+    Normalizes SQL so that queries differing only in parameters,
+    inlined literals or the length of IN lists look the same.
+    """
+    sql = LITERAL.sub('?', sql)
+    sql = IN_LIST.sub('IN (...)', sql)
+    return SPACES.sub(' ', sql).strip()
+
+
+class RequestProfile:
+
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+        self.fingerprints = Counter()
+        self.timings = defaultdict(float)
+        self.active = set()
+
+    def execute(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_time += time.perf_counter() - started
+            self.queries += 1
+            self.fingerprints[fingerprint(sql)] += 1
+
+    def duplicates(self):
+        threshold = settings.REQUEST_PROFILING_DUPLICATE_THRESHOLD
+        return [
+            {'sql': sql, 'count': count}
+            for sql, count in self.fingerprints.most_common()
+            if count >= threshold
+        ]
+
+
+def get_profile():
+    return getattr(_state, 'profile', None)
+
+
+@contextmanager
+def timed(name):
+    """
+    Adds the time spent in the block to the 'name' timing of the
+    current request. Nested blocks with the same name are counted
+    once; outside a profiled request this does nothing.
+    """
+    profile = get_profile()
+    if profile is None or name in profile.active:
+        yield
+        return
+    profile.active.add(name)
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        profile.timings[name] += time.perf_counter() - started
+        profile.active.discard(name)
+
+
+class TimedSerializerMixin:
+    """
+    Reports the time spent in to_representation as the 'serializer'
+    timing of the current request.
+    """
+
+    def to_representation(self, instance):
+        if get_profile() is None:
+            return super().to_representation(instance)
+        with timed('serializer'):
+            return super().to_representation(instance)
+
+
+def get_slow_requests():
+    with _slow_requests_lock:
+        return list(reversed(_slow_requests))
+
+
+class RequestProfilingMiddleware:
+    """
+    Records query count, database time, duplicated queries and named
+    timings of every request. They are reported in the Server-Timing
+    header and the log; requests slower than REQUEST_PROFILING_SLOW_MS
+    are kept in a ring buffer. Disabled unless REQUEST_PROFILING is
+    set, in which case Django drops the middleware on startup.
+    """
+
+    def __init__(self, get_response):
+        if not settings.REQUEST_PROFILING:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        profile = RequestProfile()
+        _state.profile = profile
+        started = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(
+                        connection.execute_wrapper(profile.execute)
+                    )
+                response = self.get_response(request)
+        finally:
+            _state.profile = None
+        total = (time.perf_counter() - started) * 1000
+        duplicates = profile.duplicates()
+        response['Server-Timing'] = self.get_server_timing(
+            profile, total, duplicates
+        )
+        record = {
+            'method': request.method,
+            'path': request.get_full_path(),
+            'status': response.status_code,
+            'total_ms': round(total, 2),
+            'db_ms': round(profile.db_time * 1000, 2),
+            'queries': profile.queries,
+            'timings': {
+                name: round(value * 1000, 2)
+                for name, value in profile.timings.items()
+            },
+            'duplicates': duplicates,
+        }
+        logger.info(
+            '%(method)s %(path)s %(status)s total=%(total_ms)sms '
+            'db=%(db_ms)sms queries=%(queries)s', record,
+            extra={'profile': record}
+        )
+        if total >= settings.REQUEST_PROFILING_SLOW_MS:
+            record['time'] = timezone.now().isoformat()
+            with _slow_requests_lock:
+                _slow_requests.append(record)
+        return response
+
+    def get_server_timing(self, profile, total, duplicates):
+        metrics = [
+            f'db;dur={profile.db_time * 1000:.2f};'
+            f'desc="{profile.queries} queries, '
+            f'{len(duplicates)} duplicated"'
+        ]
+        metrics.extend(
+            f'{name};dur={value * 1000:.2f}'
+            for name, value in profile.timings.items()
+        )
+        metrics.append(f'total;dur={total:.2f}')
+        return ', '.join(metrics)
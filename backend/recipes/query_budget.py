@@ -0,0 +1,102 @@
+from collections import Counter
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from .profiling import fingerprint
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+class QueryCapture:
+    """
+    Collects SQL of the queries executed inside the block. Unlike
+    CaptureQueriesContext it does not depend on DEBUG and is not
+    limited by the size of the connection's query log.
+    """
+
+    def __init__(self, using=DEFAULT_DB_ALIAS):
+        self.connection = connections[using]
+        self.queries = []
+
+    def __len__(self):
+        return len(self.queries)
+
+    def __enter__(self):
+        self.wrapper = self.connection.execute_wrapper(self.execute)
+        self.wrapper.__enter__()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.wrapper.__exit__(*exc_info)
+
+    def execute(self, execute, sql, params, many, context):
+        self.queries.append(sql)
+        return execute(sql, params, many, context)
+
+    def repeated(self, threshold):
+        return {
+            sql: count for sql, count in Counter(
+                fingerprint(sql) for sql in self.queries
+            ).items() if count >= threshold
+        }
+
+    def report(self):
+        """
+        Lists the captured queries, repeated fingerprints first with
+        their number of repetitions.
+        """
+        counts = Counter(fingerprint(sql) for sql in self.queries)
+        return '\n'.join(
+            f'{count} x {sql}' for sql, count in counts.most_common()
+        )
+
+
+@contextmanager
+def query_budget(max_queries, using=DEFAULT_DB_ALIAS):
+    """
+    Fails with QueryBudgetExceeded when the block runs more than
+    'max_queries' queries.
+    """
+    with QueryCapture(using) as capture:
+        yield capture
+    if len(capture) > max_queries:
+        raise QueryBudgetExceeded(
+            f'{len(capture)} queries executed, budget is {max_queries}:\n'
+            f'{capture.report()}'
+        )
+
+
+def assert_constant_queries(request, grow, sizes=(1, 5, 20),
+                            repeat_threshold=None, using=DEFAULT_DB_ALIAS):
+    """
+    Grows the data with 'grow(size)' before every call of 'request'
+    and fails if the number of queries changes with the data size,
+    or if a query is repeated 'repeat_threshold' times within one
+    call. The first call only warms up caches. Returns the query
+    count.
+    """
+    if repeat_threshold is None:
+        repeat_threshold = settings.REQUEST_PROFILING_DUPLICATE_THRESHOLD
+    request()
+    counts = []
+    for size in sizes:
+        grow(size)
+        with QueryCapture(using) as capture:
+            request()
+        counts.append(len(capture))
+        if capture.repeated(repeat_threshold):
+            raise QueryBudgetExceeded(
+                f'Repeated queries with {size} objects added:\n'
+                f'{capture.report()}'
+            )
+    if len(set(counts)) > 1:
+        raise QueryBudgetExceeded(
+            f'Query count depends on data size: '
+            f'{dict(zip(sizes, counts))}. Queries of the largest run:\n'
+            f'{capture.report()}'
+        )
+    return counts[0]
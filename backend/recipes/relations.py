@@ -0,0 +1,79 @@
+from django.db import models
+from rest_framework import serializers
+
+from users.models import Follow
+
+from .models import Favorite, ShoppingCart
+
+
+class UserRelations:
+    """
+    Ids of the authors followed by the user and of the recipes in
+    their favorites and shopping cart. Ids are checked on demand with
+    one query per relation for all ids asked at once, and remembered
+    until the end of the request.
+    """
+
+    RELATIONS = {
+        'following': (Follow, 'author_id'),
+        'favorited': (Favorite, 'recipe_id'),
+        'in_cart': (ShoppingCart, 'recipe_id'),
+    }
+
+    def __init__(self, user):
+        self.user = user
+        self.checked = {name: set() for name in self.RELATIONS}
+        self.found = {name: set() for name in self.RELATIONS}
+
+    def load(self, name, ids):
+        missing = set(ids) - self.checked[name]
+        if not missing:
+            return
+        model, field = self.RELATIONS[name]
+        self.found[name].update(model.objects.filter(
+            user=self.user, **{f'{field}__in': missing}
+        ).values_list(field, flat=True))
+        self.checked[name].update(missing)
+
+    def has(self, name, pk):
+        self.load(name, [pk])
+        return pk in self.found[name]
+
+    def add(self, name, pk):
+        self.checked[name].add(pk)
+        self.found[name].add(pk)
+
+    def discard(self, name, pk):
+        self.checked[name].add(pk)
+        self.found[name].discard(pk)
+
+
+def get_relations(request):
+    """
+    Returns relations of the request user, shared by all serializers
+    of the request, or None for anonymous users.
+    """
+    if request is None or not request.user.is_authenticated:
+        return None
+    http_request = getattr(request, '_request', request)
+    relations = getattr(http_request, 'user_relations', None)
+    if relations is None:
+        relations = UserRelations(request.user)
+        http_request.user_relations = relations
+    return relations
+
+
+class RelationsListSerializer(serializers.ListSerializer):
+    """
+    Lets the child serializer load relations for the whole page
+    before the objects are serialized one by one.
+    """
+
+    def to_representation(self, data):
+        if isinstance(data, models.Manager):
+            data = data.all()
+        data = list(data)
+        relations = get_relations(self.context.get('request'))
+        if relations is not None and data:
+            self.child.load_relations(relations, data)
+        return super().to_representation(data)
@@ -1,11 +1,19 @@
+from collections import Counter
+
+from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.db import transaction
 from rest_framework import serializers
 
 from recipes.models import (Favorite, Ingredient, IngredientInRecipe, Recipe,
                             ShoppingCart, Tag, TagsInRecipe)
 from users.serializers import ShowRecipeAddedSerializer, UserSerializerModified
 
+from .caches import invalidate_recipe_carts
 from .fields import Base64ImageField
+from .images import rendition_urls
+from .profiling import TimedSerializerMixin
+from .relations import RelationsListSerializer, get_relations
 
 User = get_user_model()
 
@@ -37,42 +45,77 @@ class IngredientInRecipeSerializer(serializers.ModelSerializer):
         fields = ('id', 'name', 'measurement_unit', 'amount',)
 
 
-class ShowRecipeSerializer(serializers.ModelSerializer):
+class ShowRecipeSerializer(TimedSerializerMixin,
+                           serializers.ModelSerializer):
     tags = TagSerializer(many=True, read_only=True)
     author = UserSerializerModified(read_only=True)
     ingredients = serializers.SerializerMethodField()
     is_favorited = serializers.SerializerMethodField()
     is_in_shopping_cart = serializers.SerializerMethodField()
+    images = serializers.SerializerMethodField()
 
     class Meta:
         model = Recipe
         fields = ('id', 'tags', 'author', 'ingredients',
                   'is_favorited', 'is_in_shopping_cart',
-                  'name', 'image', 'text', 'cooking_time')
+                  'name', 'image', 'images', 'text', 'cooking_time',
+                  'favorites_count', 'in_carts_count')
+        list_serializer_class = RelationsListSerializer
+
+    def load_relations(self, relations, recipes):
+        plain = [recipe.id for recipe in recipes
+                 if not hasattr(recipe, 'is_favorited')]
+        relations.load('favorited', plain)
+        relations.load('in_cart', plain)
+        relations.load('following', [
+            recipe.author_id for recipe in recipes
+            if not hasattr(recipe, 'is_author_subscribed')
+        ])
+
+    def to_representation(self, instance):
+        if hasattr(instance, 'is_author_subscribed'):
+            instance.author.is_subscribed = instance.is_author_subscribed
+        return super().to_representation(instance)
 
     def get_ingredients(self, obj):
-        qs = IngredientInRecipe.objects.filter(recipe=obj)
+        qs = obj.ingredientinrecipe_set.all()
         return IngredientInRecipeSerializer(qs, many=True).data
 
     def get_is_favorited(self, obj):
-        request = self.context.get('request')
-        if request is None or request.user.is_anonymous:
-            return False
-        user = request.user
-        return Favorite.objects.filter(recipe=obj, user=user).exists()
+        if hasattr(obj, 'is_favorited'):
+            return obj.is_favorited
+        relations = get_relations(self.context.get('request'))
+        return relations is not None and relations.has('favorited', obj.id)
 
     def get_is_in_shopping_cart(self, obj):
-        request = self.context.get('request')
-        if request is None or request.user.is_anonymous:
-            return False
-        user = request.user
-        return ShoppingCart.objects.filter(recipe=obj, user=user).exists()
+        if hasattr(obj, 'is_in_shopping_cart'):
+            return obj.is_in_shopping_cart
+        relations = get_relations(self.context.get('request'))
+        return relations is not None and relations.has('in_cart', obj.id)
+
+    def get_images(self, obj):
+        return rendition_urls(obj, self.context.get('request'))
+
+
+def resolve_ids(queryset, ids):
+    """
+    Fetches objects for all given ids with a single in_bulk query.
+    Returns the found objects by id and a list of error messages
+    about duplicate and missing ids.
+    """
+    errors = []
+    duplicates = sorted(pk for pk, total in Counter(ids).items() if total > 1)
+    if duplicates:
+        errors.append(f'Повторяющиеся id: {duplicates}')
+    found = queryset.in_bulk(set(ids))
+    missing = sorted(set(ids) - set(found))
+    if missing:
+        errors.append(f'Не найдены объекты с id: {missing}')
+    return found, errors
 
 
 class AddIngredientToRecipeSerializer(serializers.ModelSerializer):
-    id = serializers.PrimaryKeyRelatedField(
-        queryset=Ingredient.objects.all()
-    )
+    id = serializers.IntegerField()
     amount = serializers.IntegerField()
 
     class Meta:
@@ -84,11 +127,7 @@ class CreateRecipeSerializer(serializers.ModelSerializer):
     image = Base64ImageField(max_length=None, use_url=True)
     author = UserSerializerModified(read_only=True)
     ingredients = AddIngredientToRecipeSerializer(many=True)
-    tags = serializers.SlugRelatedField(
-        many=True,
-        queryset=Tag.objects.all(),
-        slug_field='id'
-    )
+    tags = serializers.ListField(child=serializers.IntegerField())
     cooking_time = serializers.IntegerField()
 
     class Meta:
@@ -96,15 +135,47 @@ class CreateRecipeSerializer(serializers.ModelSerializer):
         fields = ('id', 'tags', 'author', 'ingredients',
                   'name', 'image', 'text', 'cooking_time')
 
+    def run_validation(self, data=serializers.empty):
+        try:
+            return super().run_validation(data)
+        except serializers.ValidationError:
+            self.fields['image'].close_upload()
+            raise
+
+    def save(self, **kwargs):
+        try:
+            return super().save(**kwargs)
+        finally:
+            self.fields['image'].close_upload()
+
     def validate(self, data):
-        ingredients = self.initial_data.get('ingredients')
-        for item in ingredients:
-            if int(item['amount']) < 0:
-                raise serializers.ValidationError(
-                    {'ingredients': (
-                        'Убедитесь, что количества ингредиента больше 0')
-                     }
+        errors = {}
+        ingredients = data.get('ingredients')
+        if ingredients is not None:
+            ingredient_errors = []
+            if any(item['amount'] < 0 for item in ingredients):
+                ingredient_errors.append(
+                    'Убедитесь, что количества ингредиента больше 0'
                 )
+            found, id_errors = resolve_ids(
+                Ingredient.objects.all(),
+                [item['id'] for item in ingredients]
+            )
+            ingredient_errors.extend(id_errors)
+            if ingredient_errors:
+                errors['ingredients'] = ingredient_errors
+            else:
+                for item in ingredients:
+                    item['id'] = found[item['id']]
+        tags = data.get('tags')
+        if tags is not None:
+            found, tag_errors = resolve_ids(Tag.objects.all(), tags)
+            if tag_errors:
+                errors['tags'] = tag_errors
+            else:
+                data['tags'] = [found[pk] for pk in tags]
+        if errors:
+            raise serializers.ValidationError(errors)
         return data
 
     def validate_cooking_time(self, data):
@@ -114,28 +185,30 @@ class CreateRecipeSerializer(serializers.ModelSerializer):
             )
         return data
 
+    @transaction.atomic
     def create(self, validated_data):
 
         ingredients_data = validated_data.pop('ingredients')
         tags_data = validated_data.pop('tags')
         author = self.context.get('request').user
         recipe = Recipe.objects.create(author=author, **validated_data)
-        for ingredient in ingredients_data:
-            ingredient_model = ingredient['id']
-            amount = ingredient['amount']
-            IngredientInRecipe.objects.create(
-                ingredient=ingredient_model,
+        IngredientInRecipe.objects.bulk_create(
+            IngredientInRecipe(
+                ingredient=ingredient['id'],
                 recipe=recipe,
-                amount=amount
+                amount=ingredient['amount']
             )
-        for tag in tags_data:
-            TagsInRecipe.objects.create(recipe=recipe, tag=tag)
+            for ingredient in ingredients_data
+        )
+        TagsInRecipe.objects.bulk_create(
+            TagsInRecipe(recipe=recipe, tag=tag) for tag in tags_data
+        )
         return recipe
 
+    @transaction.atomic
     def update(self, instance, validated_data):
         tags_data = validated_data.pop('tags')
         ingredient_data = validated_data.pop('ingredients')
-        IngredientInRecipe.objects.filter(recipe=instance).delete()
         instance.name = validated_data.pop('name')
         instance.text = validated_data.pop('text')
         if validated_data.get('image') is not None:
@@ -143,20 +216,55 @@ class CreateRecipeSerializer(serializers.ModelSerializer):
         instance.cooking_time = validated_data.pop('cooking_time')
         instance.save()
         instance.tags.set(tags_data)
+        self.update_ingredients(instance, ingredient_data)
+        return instance
 
+    def update_ingredients(self, instance, ingredient_data):
+        """
+        Compares submitted ingredients with the stored ones and
+        only inserts, updates or deletes the rows that changed.
+        """
+        existing = {}
+        to_delete = []
+        for row in IngredientInRecipe.objects.filter(recipe=instance):
+            if row.ingredient_id in existing:
+                to_delete.append(row.id)
+            else:
+                existing[row.ingredient_id] = row
+        to_create = []
+        to_update = []
         for new_ingredient in ingredient_data:
-            IngredientInRecipe.objects.create(
-                ingredient=new_ingredient['id'],
-                recipe=instance,
-                amount=new_ingredient['amount']
-            )
-        return instance
+            ingredient = new_ingredient['id']
+            amount = new_ingredient['amount']
+            row = existing.pop(ingredient.id, None)
+            if row is None:
+                to_create.append(IngredientInRecipe(
+                    ingredient=ingredient,
+                    recipe=instance,
+                    amount=amount
+                ))
+            elif row.amount != amount:
+                row.amount = amount
+                to_update.append(row)
+        to_delete.extend(row.id for row in existing.values())
+        if to_delete:
+            IngredientInRecipe.objects.filter(id__in=to_delete).delete()
+        if to_create:
+            IngredientInRecipe.objects.bulk_create(to_create)
+        if to_update:
+            IngredientInRecipe.objects.bulk_update(to_update, ['amount'])
+        if to_create or to_update:
+            invalidate_recipe_carts(instance.id)
 
     def to_representation(self, instance):
+        request = self.context.get('request')
+        instance = Recipe.objects.with_related().with_user_flags(
+            request.user
+        ).get(pk=instance.pk)
         return ShowRecipeSerializer(
             instance,
             context={
-                'request': self.context.get('request')
+                'request': request
             }).data
 
 
@@ -180,3 +288,24 @@ class ShoppingCartSerializer(FavoriteSerializer):
 
     class Meta(FavoriteSerializer.Meta):
         model = ShoppingCart
+
+
+class RecipeIdsSerializer(serializers.Serializer):
+    recipes = serializers.ListField(
+        child=serializers.IntegerField(min_value=1), allow_empty=False
+    )
+
+    def validate_recipes(self, value):
+        limit = settings.RECIPE_BATCH_MAX_SIZE
+        if len(value) > limit:
+            raise serializers.ValidationError(
+                f'Не больше {limit} рецептов за один запрос'
+            )
+        duplicates = sorted(
+            pk for pk, total in Counter(value).items() if total > 1
+        )
+        if duplicates:
+            raise serializers.ValidationError(
+                f'Повторяющиеся id: {duplicates}'
+            )
+        return value
@@ -0,0 +1,132 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from users.models import Follow
+
+from .caches import bump_cart_generation, invalidate_recipe_carts
+from .counters import change_counter
+from .feed import backfill_follow, fan_out_recipe, prune_follow
+from .images import needs_renditions, release_image, schedule_renditions
+from .indexes import ingredient_index
+from .models import (Favorite, Ingredient, IngredientInRecipe, Recipe,
+                     RecipeScore, ShoppingCart, User)
+
+
+@receiver(post_save, sender=ShoppingCart)
+@receiver(post_delete, sender=ShoppingCart)
+def shopping_cart_changed(sender, instance, **kwargs):
+    user_id = instance.user_id
+    transaction.on_commit(lambda: bump_cart_generation([user_id]))
+
+
+@receiver(post_save, sender=IngredientInRecipe)
+@receiver(post_delete, sender=IngredientInRecipe)
+def recipe_ingredients_changed(sender, instance, **kwargs):
+    invalidate_recipe_carts(instance.recipe_id)
+
+
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Ingredient)
+def ingredient_changed(sender, instance, **kwargs):
+    transaction.on_commit(ingredient_index.invalidate)
+
+
+@receiver(post_save, sender=Favorite)
+def favorite_created(sender, instance, created, **kwargs):
+    if created:
+        change_counter(
+            Recipe.objects.filter(pk=instance.recipe_id), 'favorites_count', 1
+        )
+
+
+@receiver(post_delete, sender=Favorite)
+def favorite_deleted(sender, instance, **kwargs):
+    change_counter(
+        Recipe.objects.filter(pk=instance.recipe_id), 'favorites_count', -1
+    )
+
+
+@receiver(post_save, sender=ShoppingCart)
+def shopping_cart_created(sender, instance, created, **kwargs):
+    if created:
+        change_counter(
+            Recipe.objects.filter(pk=instance.recipe_id), 'in_carts_count', 1
+        )
+
+
+@receiver(post_delete, sender=ShoppingCart)
+def shopping_cart_deleted(sender, instance, **kwargs):
+    change_counter(
+        Recipe.objects.filter(pk=instance.recipe_id), 'in_carts_count', -1
+    )
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_created(sender, instance, created, **kwargs):
+    if created:
+        change_counter(
+            User.objects.filter(pk=instance.author_id), 'recipes_count', 1
+        )
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_score_created(sender, instance, created, **kwargs):
+    if created:
+        RecipeScore.objects.create(recipe=instance)
+
+
+@receiver(post_delete, sender=Recipe)
+def recipe_deleted(sender, instance, **kwargs):
+    change_counter(
+        User.objects.filter(pk=instance.author_id), 'recipes_count', -1
+    )
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_published(sender, instance, created, **kwargs):
+    if created:
+        transaction.on_commit(lambda: fan_out_recipe(instance))
+
+
+@receiver(post_save, sender=Follow)
+def follow_created(sender, instance, created, **kwargs):
+    if created:
+        transaction.on_commit(lambda: backfill_follow(instance))
+
+
+@receiver(post_delete, sender=Follow)
+def follow_deleted(sender, instance, **kwargs):
+    prune_follow(instance)
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_image_saved(sender, instance, **kwargs):
+    if needs_renditions(instance):
+        name = instance.image.name
+        transaction.on_commit(lambda: schedule_renditions(name))
+
+
+@receiver(pre_save, sender=Recipe)
+def remember_recipe_image(sender, instance, **kwargs):
+    instance.previous_image = None
+    if instance.pk:
+        instance.previous_image = Recipe.objects.filter(
+            pk=instance.pk
+        ).values('image', 'image_renditions').first()
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_image_replaced(sender, instance, **kwargs):
+    previous = getattr(instance, 'previous_image', None)
+    if previous and previous['image'] != instance.image.name:
+        transaction.on_commit(lambda: release_image(
+            previous['image'], previous['image_renditions']
+        ))
+
+
+@receiver(post_delete, sender=Recipe)
+def recipe_image_deleted(sender, instance, **kwargs):
+    name = instance.image.name
+    renditions = instance.image_renditions
+    transaction.on_commit(lambda: release_image(name, renditions))
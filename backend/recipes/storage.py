@@ -0,0 +1,57 @@
+import hashlib
+import posixpath
+
+from django.core.files.base import File
+from django.core.files.storage import FileSystemStorage
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.utils.deconstruct import deconstructible
+
+
+def lock_file(name, using=DEFAULT_DB_ALIAS):
+    """
+    Takes a transaction-level advisory lock on a stored name, released
+    on commit or rollback. Saving a file and deleting an unreferenced
+    one both hold it, so a file is never deleted while a transaction
+    that references it is still running. Other backends serialize
+    writes anyway, so nothing is done there.
+    """
+    connection = connections[using]
+    if connection.vendor != 'postgresql':
+        return
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT pg_advisory_xact_lock(hashtext(%s))', [name])
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    """
+    Names files by the SHA-256 of their content, so identical uploads
+    are stored once. An existing file is never written again: a file
+    with the same name already has the same content. Files must be
+    saved in the transaction that references them, which keeps the
+    name locked until the reference is committed.
+    """
+
+    def content_name(self, name, content):
+        digest = hashlib.sha256()
+        content.seek(0)
+        for chunk in content.chunks():
+            digest.update(chunk)
+        content.seek(0)
+        directory, filename = posixpath.split(name)
+        extension = posixpath.splitext(filename)[1].lower()
+        return posixpath.join(directory, f'{digest.hexdigest()}{extension}')
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+        name = self.content_name(name, content)
+        lock_file(name)
+        if self.exists(name):
+            return name
+        return super().save(name, content, max_length=max_length)
+
+
+content_addressed_storage = ContentAddressedStorage()
@@ -0,0 +1,181 @@
+import base64
+import io
+import shutil
+import tempfile
+
+from django.core.cache import cache
+from django.test import override_settings
+from PIL import Image
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APITestCase
+
+from recipes.models import (Favorite, FeedEntry, Ingredient,
+                            IngredientInRecipe, Recipe, ShoppingCart, Tag,
+                            TagsInRecipe, User)
+from recipes.query_budget import assert_constant_queries
+from users.models import Follow
+
+MEDIA_ROOT = tempfile.mkdtemp()
+
+
+def image_content(color='orange'):
+    buffer = io.BytesIO()
+    Image.new('RGB', (16, 16), color).save(buffer, 'PNG')
+    return buffer.getvalue()
+
+
+def image_data_url():
+    return 'data:image/png;base64,' + base64.b64encode(
+        image_content()
+    ).decode()
+
+
+@override_settings(
+    MEDIA_ROOT=MEDIA_ROOT,
+    PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'],
+)
+class QueryBudgetTestCase(APITestCase):
+    """
+    A viewer following authors whose recipes are favorited, carted and
+    written to the viewer's feed. assertConstantQueries() grows this
+    data between calls of a route.
+    """
+
+    sizes = (1, 5, 20)
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        self.created = 0
+        self.password = 'Budget-password-0'
+        self.user = User.objects.create_user(
+            email='viewer@example.com', password=self.password,
+            username='viewer', first_name='Budget', last_name='viewer',
+            is_staff=True
+        )
+        self.login()
+        self.tags = [
+            Tag.objects.create(name=name, hexcolor=color, slug=color[1:])
+            for color, name in Tag.COLOR_CHOICES[:2]
+        ]
+        self.ingredients = [
+            Ingredient.objects.create(
+                name=f'budget_{index}', measurement_unit='г'
+            )
+            for index in range(3)
+        ]
+        self.own_recipe = self.create_recipe(self.user)
+        self.grow(1)
+
+    def login(self):
+        token, _ = Token.objects.get_or_create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+
+    def create_user(self, name, **fields):
+        self.created += 1
+        username = f'budget_{name}_{self.created}'
+        return User.objects.create(
+            email=f'{username}@example.com', username=username,
+            first_name='Budget', last_name=name, **fields
+        )
+
+    def create_recipe(self, author):
+        recipe = Recipe.objects.create(
+            author=author, name='budget',
+            text='Проверка бюджета запросов', cooking_time=5,
+            image='recipes/images/budget.jpg'
+        )
+        IngredientInRecipe.objects.bulk_create([
+            IngredientInRecipe(recipe=recipe, ingredient=ingredient, amount=1)
+            for ingredient in self.ingredients
+        ])
+        TagsInRecipe.objects.bulk_create([
+            TagsInRecipe(recipe=recipe, tag=tag) for tag in self.tags
+        ])
+        return recipe
+
+    def grow(self, size):
+        """
+        Adds 'size' followed authors with a recipe each; the recipes
+        are favorited, carted and written to the viewer's feed. Also
+        creates a spare author and recipe the viewer has no relations
+        with, for the toggle endpoints.
+        """
+        for _ in range(size):
+            author = self.create_user('author')
+            recipe = self.create_recipe(author)
+            Follow.objects.create(user=self.user, author=author)
+            Follow.objects.create(user=author, author=self.user)
+            Favorite.objects.create(user=self.user, recipe=recipe)
+            ShoppingCart.objects.create(user=self.user, recipe=recipe)
+            FeedEntry.objects.create(
+                user=self.user, recipe=recipe, pub_date=recipe.pub_date
+            )
+            self.recipe = recipe
+        self.spare_author = self.create_user('spare')
+        self.spare_recipe = self.create_recipe(self.spare_author)
+
+    def grow_with(self, relation):
+        def grow(size):
+            self.grow(size)
+            relation()
+        return grow
+
+    def grow_ingredients(self, size):
+        """
+        Grows the data and adds 'size' ingredients to the recipe
+        payload, so the write path is checked with 30+ ingredients.
+        """
+        self.grow(size)
+        for _ in range(size):
+            self.created += 1
+            self.ingredients.append(Ingredient.objects.create(
+                name=f'budget_{self.created}', measurement_unit='г'
+            ))
+
+    def batch_ids(self):
+        return list(Recipe.objects.order_by('-id').values_list(
+            'id', flat=True
+        )[:50])
+
+    def recipe_payload(self):
+        self.created += 1
+        return {
+            'name': 'budget',
+            'text': 'Проверка бюджета запросов',
+            'cooking_time': 5,
+            'image': image_data_url(),
+            'tags': [tag.id for tag in self.tags],
+            'ingredients': [
+                {'id': ingredient.id, 'amount': self.created}
+                for ingredient in self.ingredients
+            ],
+        }
+
+    def call(self, method, path, data=None):
+        response = getattr(self.client, method)(path, data, format='json')
+        if response.status_code >= 400:
+            self.fail(
+                f'{method.upper()} {path} returned {response.status_code}: '
+                f'{response.content[:500]}'
+            )
+        if response.streaming:
+            b''.join(response.streaming_content)
+        return response
+
+    def assertConstantQueries(  # noqa: N802
+        self, request, grow=None, sizes=None
+    ):
+        """
+        Calls the route returned by 'request' as (method, path, data)
+        after growing the data, and fails with the repeated SQL if the
+        number of queries depends on the data size.
+        """
+        return assert_constant_queries(
+            lambda: self.call(*request()), grow or self.grow,
+            sizes or self.sizes
+        )
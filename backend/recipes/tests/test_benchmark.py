@@ -0,0 +1,45 @@
+import io
+import json
+import os
+import tempfile
+
+from django.core.management import call_command
+
+from recipes.management.commands.run_benchmark import BENCHMARK_RECIPE_NAME
+from recipes.models import Recipe
+
+from .base import MEDIA_ROOT, QueryBudgetTestCase
+
+
+class BenchmarkCommandsTest(QueryBudgetTestCase):
+
+    def test_run_benchmark_leaves_no_data(self):
+        call_command(
+            'seed_benchmark', users=5, follows=2, recipes=20, favorites=3,
+            cart=3, cart_sizes=[2, 5], seed=1, stdout=io.StringIO()
+        )
+        recipes = Recipe.objects.count()
+        images = os.path.join(MEDIA_ROOT, 'recipes/images')
+        os.makedirs(images, exist_ok=True)
+        files = set(os.listdir(images))
+        with tempfile.TemporaryDirectory() as directory:
+            output = os.path.join(directory, 'benchmark.json')
+            call_command(
+                'run_benchmark', iterations=1, output=output, deep_page=2,
+                cart_sizes=[2, 5], stdout=io.StringIO()
+            )
+            with open(output, encoding='utf-8') as file:
+                results = json.load(file)['results']
+
+        self.assertEqual(results['recipe_create']['status'], 201)
+        self.assertEqual(
+            results['download_shopping_cart_5_not_modified']['status'], 304
+        )
+        for name in ('recipes_search', 'recipes_search_typo',
+                     'ingredients_db_icontains'):
+            self.assertIn(name, results)
+        self.assertEqual(Recipe.objects.count(), recipes)
+        self.assertFalse(
+            Recipe.objects.filter(name=BENCHMARK_RECIPE_NAME).exists()
+        )
+        self.assertEqual(set(os.listdir(images)), files)
@@ -0,0 +1,45 @@
+from recipes.models import Favorite, Recipe, ShoppingCart
+from users.models import CustomUser, Follow
+
+from .base import QueryBudgetTestCase
+
+
+class CounterFieldsTest(QueryBudgetTestCase):
+    """
+    Saving an object loaded before its counters changed keeps the
+    counters written by change_counter().
+    """
+
+    def test_stale_recipe_save(self):
+        recipe = Recipe.objects.get(pk=self.spare_recipe.pk)
+        Favorite.objects.create(user=self.user, recipe=recipe)
+        ShoppingCart.objects.create(user=self.user, recipe=recipe)
+        recipe.name = 'renamed'
+        recipe.save()
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.name, 'renamed')
+        self.assertEqual(
+            (recipe.favorites_count, recipe.in_carts_count), (1, 1)
+        )
+
+    def test_stale_user_save(self):
+        author = CustomUser.objects.get(pk=self.spare_author.pk)
+        Follow.objects.create(user=self.user, author=author)
+        self.create_recipe(author)
+        author.first_name = 'Renamed'
+        author.save()
+        author.refresh_from_db()
+        self.assertEqual(author.first_name, 'Renamed')
+        # The spare recipe of grow() and the one created here.
+        self.assertEqual(
+            (author.followers_count, author.recipes_count), (1, 2)
+        )
+
+    def test_new_object_saves_counters(self):
+        recipe = Recipe(
+            author=self.user, name='new', text='new', cooking_time=1,
+            image='recipes/images/budget.jpg', favorites_count=3
+        )
+        recipe.save()
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.favorites_count, 3)
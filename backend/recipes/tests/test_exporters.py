@@ -0,0 +1,97 @@
+import os
+from unittest import skipUnless
+
+from django.conf import settings
+from django.test import override_settings
+
+from recipes.models import Ingredient, IngredientInRecipe, ShoppingCart
+
+from .base import QueryBudgetTestCase
+
+URL = '/api/recipes/download_shopping_cart/'
+
+
+class ShoppingListExportTest(QueryBudgetTestCase):
+    """
+    The carted recipes of the viewer share the three setUp
+    ingredients, one of each per recipe, and the spare recipe is not
+    in the cart.
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.grow(1)
+        carted = ShoppingCart.objects.filter(user=self.user).count()
+        self.expected = [
+            (ingredient.name, carted, ingredient.measurement_unit)
+            for ingredient in sorted(
+                self.ingredients, key=lambda ingredient: ingredient.name
+            )
+        ]
+
+    def download(self, export_format):
+        response = self.client.get(URL, {'format': export_format})
+        self.assertEqual(response.status_code, 200)
+        if response.streaming:
+            return b''.join(response.streaming_content)
+        return response.content
+
+    def test_text(self):
+        self.assertEqual(self.download('txt').decode(), ''.join(
+            f'{name} - {amount} ({unit})\n'
+            for name, amount, unit in self.expected
+        ))
+
+    def test_csv(self):
+        self.assertEqual(self.download('csv').decode().splitlines(), [
+            'Ингредиент,Количество,Единица',
+            *(f'{name},{amount},{unit}' for name, amount, unit
+              in self.expected),
+        ])
+
+    def test_cached_list_follows_cart(self):
+        first = self.download('txt')
+        self.assertEqual(self.download('txt'), first)
+        with self.captureOnCommitCallbacks(execute=True):
+            ShoppingCart.objects.filter(user=self.user).delete()
+        self.assertEqual(self.download('txt'), b'')
+
+    def test_unknown_format(self):
+        response = self.client.get(URL, {'format': 'xls'})
+        self.assertEqual(response.status_code, 400)
+
+    @skipUnless(os.path.exists(settings.SHOPPING_LIST_PDF_FONT),
+                'SHOPPING_LIST_PDF_FONT is not installed')
+    def test_pdf_embeds_font(self):
+        content = self.download('pdf')
+        self.assertTrue(content.startswith(b'%PDF'))
+        self.assertTrue(content.rstrip().endswith(b'%%EOF'))
+        self.assertIn(b'DejaVuSans', content)
+
+    @skipUnless(os.path.exists(settings.SHOPPING_LIST_PDF_FONT),
+                'SHOPPING_LIST_PDF_FONT is not installed')
+    def test_pdf_pages(self):
+        ingredients = Ingredient.objects.bulk_create([
+            Ingredient(name=f'pdf_{index:03}', measurement_unit='г')
+            for index in range(100)
+        ])
+        IngredientInRecipe.objects.bulk_create([
+            IngredientInRecipe(
+                recipe=self.recipe, ingredient=ingredient, amount=1
+            )
+            for ingredient in Ingredient.objects.filter(
+                name__in=[ingredient.name for ingredient in ingredients]
+            )
+        ])
+        content = self.download('pdf')
+        # 103 lines at 41 lines a page.
+        self.assertEqual(content.count(b'/Type /Page\n'), 3)
+
+    @override_settings(SHOPPING_LIST_PDF_FONT='/nonexistent/font.ttf')
+    def test_pdf_without_font(self):
+        with self.assertLogs('recipes.views', 'ERROR'):
+            response = self.client.get(URL, {'format': 'pdf'})
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(
+            self.client.get(URL, {'format': 'txt'}).status_code, 200
+        )
@@ -0,0 +1,67 @@
+from django.test import override_settings
+
+from recipes.models import FeedEntry, Recipe
+from users.models import Follow
+
+from .base import QueryBudgetTestCase
+
+
+@override_settings(FEED_FANOUT_MAX_FOLLOWERS=2)
+class FeedTest(QueryBudgetTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.grow(4)
+        self.pull_author = self.create_user('pull')
+        Follow.objects.create(user=self.user, author=self.pull_author)
+        type(self.pull_author).objects.filter(
+            pk=self.pull_author.pk
+        ).update(followers_count=3)
+        pull_recipes = [
+            self.create_recipe(self.pull_author) for _ in range(3)
+        ]
+        # Fanned out before the author got too many followers.
+        FeedEntry.objects.create(
+            user=self.user, recipe=pull_recipes[0],
+            pub_date=pull_recipes[0].pub_date
+        )
+        self.expected = list(Recipe.objects.filter(
+            author__following__user=self.user
+        ).order_by('-pub_date', '-id').values_list('id', flat=True))
+
+    def walk(self, url, link):
+        ids = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            page = [recipe['id'] for recipe in response.data['results']]
+            ids.extend(page if link == 'next' else reversed(page))
+            url = response.data[link]
+        return ids
+
+    def test_pages_cover_feed_once(self):
+        self.assertEqual(len(self.expected), 8)
+        forward = self.walk('/api/recipes/feed/?limit=3', 'next')
+        self.assertEqual(forward, self.expected)
+
+    def test_previous_pages(self):
+        response = self.client.get('/api/recipes/feed/?limit=3')
+        for _ in range(2):
+            response = self.client.get(response.data['next'])
+        self.assertIsNone(response.data['next'])
+        backward = self.walk(response.data['previous'], 'previous')
+        last = [recipe['id'] for recipe in response.data['results']]
+        self.assertEqual(
+            list(reversed(backward)) + last, self.expected
+        )
+
+    def test_fanned_out_only(self):
+        Follow.objects.filter(author=self.pull_author).delete()
+        FeedEntry.objects.filter(recipe__author=self.pull_author).delete()
+        expected = [
+            recipe_id for recipe_id in self.expected
+            if Recipe.objects.get(id=recipe_id).author != self.pull_author
+        ]
+        self.assertEqual(
+            self.walk('/api/recipes/feed/?limit=3', 'next'), expected
+        )
@@ -0,0 +1,47 @@
+import base64
+import textwrap
+from unittest import mock
+
+from recipes.fields import Base64ImageField
+
+from .base import QueryBudgetTestCase, image_content
+
+
+class Base64ImageFieldTest(QueryBudgetTestCase):
+
+    def post_recipe(self, **fields):
+        uploads = []
+        decode = Base64ImageField.decode
+
+        def record(field, data):
+            uploads.append(decode(field, data))
+            return uploads[-1]
+
+        with mock.patch.object(Base64ImageField, 'decode', record):
+            response = self.client.post(
+                '/api/recipes/', {**self.recipe_payload(), **fields},
+                format='json'
+            )
+        return response, uploads
+
+    def test_wrapped_base64(self):
+        content = image_content('navy')
+        encoded = base64.b64encode(content).decode()
+        wrapped = '\r\n'.join(textwrap.wrap(encoded, 76)) + '\n '
+        field = Base64ImageField()
+        upload = field.to_internal_value(f'data:image/png;base64,{wrapped}')
+        self.assertEqual(upload.read(), content)
+        field.close_upload()
+        self.assertTrue(upload.closed)
+
+    def test_upload_closed_after_save(self):
+        response, uploads = self.post_recipe()
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(len(uploads), 1)
+        self.assertTrue(uploads[0].closed)
+
+    def test_upload_closed_after_failed_validation(self):
+        response, uploads = self.post_recipe(cooking_time=0)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(len(uploads), 1)
+        self.assertTrue(uploads[0].closed)
@@ -0,0 +1,40 @@
+from recipes.models import Favorite, RecipeScore
+
+from .base import QueryBudgetTestCase
+
+
+class RecipeFilterTest(QueryBudgetTestCase):
+
+    def get_ids(self, params):
+        response = self.client.get('/api/recipes/', {'limit': 100, **params})
+        self.assertEqual(response.status_code, 200)
+        return [recipe['id'] for recipe in response.data['results']]
+
+    def test_new_recipe_has_score(self):
+        recipe = self.create_recipe(self.user)
+        self.assertTrue(RecipeScore.objects.filter(recipe=recipe).exists())
+
+    def test_ordering_by_score(self):
+        self.grow(3)
+        recipes = [self.own_recipe, self.spare_recipe, self.recipe]
+        for popular, recipe in enumerate(recipes, start=1):
+            RecipeScore.objects.filter(recipe=recipe).update(
+                popular=popular, trending=-popular
+            )
+        ids = self.get_ids({'ordering': 'popular'})
+        self.assertEqual(ids[:3], [recipe.id for recipe in recipes[::-1]])
+        # Equal scores are ordered by id, newest first.
+        rest = ids[3:]
+        self.assertEqual(rest, sorted(rest, reverse=True))
+        ids = self.get_ids({'ordering': 'trending'})
+        self.assertEqual(ids[-3:], [recipe.id for recipe in recipes])
+
+    def test_user_flags(self):
+        self.assertEqual(
+            self.get_ids({'is_favorited': 1}),
+            list(Favorite.objects.filter(user=self.user).order_by(
+                '-recipe__pub_date'
+            ).values_list('recipe_id', flat=True))
+        )
+        self.client.credentials()
+        self.assertEqual(self.get_ids({'is_favorited': 1}), [])
@@ -0,0 +1,110 @@
+import io
+import os
+import shutil
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.db import transaction
+from django.test import TestCase, override_settings
+
+from recipes.images import build_renditions, release_image
+from recipes.management.commands.deduplicate_images import \
+    Command as DeduplicateImages
+from recipes.models import Recipe, User
+
+from .base import MEDIA_ROOT, image_content
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+class BuildRenditionsTest(TestCase):
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+
+    def test_existing_renditions_are_kept(self):
+        name = default_storage.save(
+            'recipes/images/renditions.png', ContentFile(image_content())
+        )
+        first = build_renditions(name)
+        paths = [
+            default_storage.path(target)
+            for formats in first.values() for target in formats.values()
+        ]
+        modified = [os.stat(path).st_mtime_ns for path in paths]
+        directory = os.path.dirname(default_storage.path(name))
+        files = sorted(os.listdir(directory))
+
+        self.assertEqual(build_renditions(name), first)
+        self.assertEqual(
+            [os.stat(path).st_mtime_ns for path in paths], modified
+        )
+        self.assertEqual(sorted(os.listdir(directory)), files)
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+class DeduplicateImagesTest(TestCase):
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.author = User.objects.create(
+            email='images@example.com', username='images',
+            first_name='Images', last_name='author'
+        )
+        self.names = []
+        for index in range(2):
+            name = f'recipes/images/legacy_{index}.png'
+            path = default_storage.path(name)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'wb') as file:
+                file.write(image_content())
+            Recipe.objects.create(
+                author=self.author, name='images', text='images',
+                cooking_time=5, image=name
+            )
+            self.names.append(name)
+
+    def test_rename(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command('deduplicate_images', stdout=io.StringIO())
+        recipes = list(Recipe.objects.all())
+        content_name = recipes[0].image.name
+        self.assertNotIn(content_name, self.names)
+        for recipe in recipes:
+            self.assertEqual(recipe.image.name, content_name)
+            self.assertEqual(recipe.image_renditions['source'], content_name)
+        for name in self.names:
+            self.assertFalse(default_storage.exists(name))
+        for formats in recipes[0].image_renditions['files'].values():
+            for rendition in formats.values():
+                self.assertTrue(default_storage.exists(rendition))
+
+    def test_rollback_keeps_files(self):
+        storage = Recipe._meta.get_field('image').storage
+        with self.captureOnCommitCallbacks(execute=True):
+            with self.assertRaises(RuntimeError):
+                with transaction.atomic():
+                    DeduplicateImages().rename(storage, self.names[0])
+                    raise RuntimeError
+        self.assertTrue(default_storage.exists(self.names[0]))
+        self.assertTrue(Recipe.objects.filter(image=self.names[0]).exists())
+
+    def test_release_image(self):
+        name = self.names[0]
+        renditions = build_renditions(name)
+        files = [
+            target for formats in renditions.values()
+            for target in formats.values()
+        ]
+        self.assertFalse(release_image(name, {'files': renditions}))
+        self.assertTrue(default_storage.exists(name))
+        Recipe.objects.filter(image=name).delete()
+        self.assertTrue(release_image(name, {'files': renditions}))
+        for target in [name, *files]:
+            self.assertFalse(default_storage.exists(target))
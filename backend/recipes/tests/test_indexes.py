@@ -0,0 +1,59 @@
+from django.core.cache import cache
+from django.test import TestCase
+
+from recipes.indexes import ingredient_index
+from recipes.models import Ingredient
+
+
+class IngredientIndexTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.ingredients = {
+            name: Ingredient.objects.create(name=name, measurement_unit='г')
+            for name in ('сметана', 'сахар', 'тесто слоёное', 'ёрш',
+                         'Ерш', 'мёд', 'овсяное молоко', 'молоко')
+        }
+        ingredient_index.invalidate()
+
+    def search(self, query, limit=10):
+        return [
+            ingredient.name
+            for ingredient in ingredient_index.search(query, limit)
+        ]
+
+    def test_prefix_first(self):
+        self.assertEqual(
+            self.search('молоко'), ['молоко', 'овсяное молоко']
+        )
+        self.assertEqual(self.search('с'), [
+            'сахар', 'сметана', 'овсяное молоко', 'тесто слоёное'
+        ])
+
+    def test_limit_keeps_prefix_matches(self):
+        self.assertEqual(self.search('с', limit=2), ['сахар', 'сметана'])
+
+    def test_yo_folding(self):
+        self.assertEqual(self.search('мед'), ['мёд'])
+        self.assertEqual(self.search('МЁД'), ['мёд'])
+        self.assertEqual(self.search('слоеное'), ['тесто слоёное'])
+
+    def test_ties_by_id(self):
+        # 'ёрш' and 'Ерш' normalize to the same key.
+        self.assertEqual(self.search('ерш'), ['ёрш', 'Ерш'])
+
+    def test_invalidated_on_change(self):
+        self.assertEqual(self.search('сах'), ['сахар'])
+        with self.captureOnCommitCallbacks(execute=True):
+            Ingredient.objects.create(name='сахарная пудра',
+                                      measurement_unit='г')
+        self.assertEqual(self.search('сах'), ['сахар', 'сахарная пудра'])
+
+    def test_api(self):
+        response = self.client.get('/api/ingredients/', {'name': 'Мед'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data, [{
+            'id': self.ingredients['мёд'].id,
+            'name': 'мёд',
+            'measurement_unit': 'г',
+        }])
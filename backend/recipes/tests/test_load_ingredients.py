@@ -0,0 +1,38 @@
+import io
+import json
+import os
+import tempfile
+
+from django.core.management import CommandError, call_command
+from django.test import TestCase
+
+from recipes.models import Ingredient
+
+
+class LoadIngredientsTest(TestCase):
+
+    def load(self, items):
+        with tempfile.NamedTemporaryFile(
+            'w', suffix='.json', encoding='utf-8', delete=False
+        ) as file:
+            json.dump(items, file, ensure_ascii=False)
+        self.addCleanup(os.remove, file.name)
+        call_command('load_ingredients', file.name, stdout=io.StringIO())
+
+    def test_json(self):
+        self.load([
+            {'title': 'соль', 'dimension': 'г'},
+            {'title': 'соль', 'dimension': 'кг'},
+            {'title': 'вода', 'dimension': 'мл'},
+        ])
+        self.assertEqual(
+            dict(Ingredient.objects.values_list('name', 'measurement_unit')),
+            {'соль': 'кг', 'вода': 'мл'}
+        )
+
+    def test_malformed_json_item(self):
+        for item in ({'title': 'соль'}, ['соль', 'г'],
+                     {'title': 'соль', 'dimension': None}):
+            with self.subTest(item=item):
+                with self.assertRaisesMessage(CommandError, repr(item)):
+                    self.load([{'title': 'вода', 'dimension': 'мл'}, item])
@@ -0,0 +1,91 @@
+import json
+from base64 import urlsafe_b64encode
+
+from django.utils import timezone
+
+from recipes.models import Recipe
+from users.models import CustomUser
+
+from .base import QueryBudgetTestCase
+
+
+def encode(cursor):
+    return urlsafe_b64encode(json.dumps(cursor).encode()).decode()
+
+
+class KeysetPaginatorTest(QueryBudgetTestCase):
+
+    def walk(self, url, params, link='next'):
+        ids = []
+        response = self.client.get(url, params)
+        while True:
+            self.assertEqual(response.status_code, 200)
+            page = [item['id'] for item in response.data['results']]
+            ids.extend(page if link == 'next' else reversed(page))
+            if not response.data[link]:
+                return ids, response
+            response = self.client.get(response.data[link])
+
+    def test_recipe_pages_cover_every_row_once(self):
+        self.grow(6)
+        # Ties on pub_date are resolved by id inside the page bound.
+        Recipe.objects.filter(
+            id__in=Recipe.objects.order_by('id').values('id')[:6]
+        ).update(pub_date=timezone.now())
+        expected = list(Recipe.objects.order_by(
+            '-pub_date', '-id'
+        ).values_list('id', flat=True))
+
+        forward, last = self.walk(
+            '/api/recipes/', {'pagination': 'cursor', 'limit': 3}
+        )
+        self.assertEqual(forward, expected)
+        backward, first = self.walk(
+            last.data['previous'], {}, link='previous'
+        )
+        tail = [item['id'] for item in last.data['results']]
+        self.assertEqual(backward[::-1] + tail, expected)
+        self.assertIsNone(first.data['previous'])
+
+    def test_subscription_pages_cover_every_row_once(self):
+        self.grow(6)
+        expected = list(CustomUser.objects.filter(
+            following__user=self.user
+        ).order_by('username', 'id').values_list('id', flat=True))
+
+        forward, _ = self.walk('/api/users/subscriptions/', {
+            'pagination': 'cursor', 'limit': 2
+        })
+        self.assertEqual(forward, expected)
+
+    def test_tampered_cursor(self):
+        cursors = (
+            'not-base64',
+            encode({'reverse': False}),
+            encode([False, ['2024-01-01T00:00:00+00:00']]),
+            encode([False, ['abc', 1]]),
+            encode([False, ['2024-01-01T00:00:00+00:00', 'abc']]),
+            encode([False, [None, None]]),
+        )
+        for cursor in cursors:
+            with self.subTest(cursor=cursor):
+                response = self.client.get('/api/recipes/', {
+                    'pagination': 'cursor', 'cursor': cursor
+                })
+                self.assertEqual(response.status_code, 404)
+
+    def test_tampered_subscriptions_cursor(self):
+        response = self.client.get('/api/users/subscriptions/', {
+            'pagination': 'cursor', 'cursor': encode([False, ['a', 'b']])
+        })
+        self.assertEqual(response.status_code, 404)
+
+    def test_ordering_with_cursor(self):
+        for params in ({'ordering': 'popular'}, {'ordering': 'trending'},
+                       {'search': 'budget'}):
+            with self.subTest(**params):
+                response = self.client.get('/api/recipes/', {
+                    'pagination': 'cursor', **params
+                })
+                self.assertEqual(response.status_code, 400)
+                self.assertIn(next(iter(params)), response.data)
@@ -0,0 +1,243 @@
+from recipes.caches import bump_cart_generation
+from recipes.models import Favorite, ShoppingCart
+from users.models import Follow
+
+from .base import QueryBudgetTestCase
+
+LIMIT = 'limit=100'
+WRITE_SIZES = (1, 5, 30)
+
+
+class RecipeRoutesQueryBudgetTest(QueryBudgetTestCase):
+    """
+    Routes of recipes/urls.py run the same number of queries
+    whatever the size of the data.
+    """
+
+    def test_tags(self):
+        self.assertConstantQueries(lambda: ('get', '/api/tags/'))
+
+    def test_tag(self):
+        self.assertConstantQueries(
+            lambda: ('get', f'/api/tags/{self.tags[0].id}/')
+        )
+
+    def test_ingredients(self):
+        self.assertConstantQueries(lambda: ('get', '/api/ingredients/'))
+
+    def test_ingredients_search(self):
+        self.assertConstantQueries(
+            lambda: ('get', '/api/ingredients/?name=budget')
+        )
+
+    def test_ingredient(self):
+        self.assertConstantQueries(
+            lambda: ('get', f'/api/ingredients/{self.ingredients[0].id}/')
+        )
+
+    def test_recipes(self):
+        self.assertConstantQueries(lambda: ('get', f'/api/recipes/?{LIMIT}'))
+
+    def test_recipes_cursor(self):
+        self.assertConstantQueries(
+            lambda: ('get', f'/api/recipes/?pagination=cursor&{LIMIT}')
+        )
+
+    def test_recipes_filtered(self):
+        self.assertConstantQueries(lambda: (
+            'get',
+            f'/api/recipes/?is_favorited=1&is_in_shopping_cart=1'
+            f'&tags={self.tags[0].slug}&{LIMIT}'
+        ))
+
+    def test_recipes_ordered_by_score(self):
+        self.assertConstantQueries(
+            lambda: ('get', f'/api/recipes/?ordering=popular&{LIMIT}')
+        )
+
+    def test_recipes_search(self):
+        self.assertConstantQueries(
+            lambda: ('get', f'/api/recipes/?search=budget&{LIMIT}')
+        )
+
+    def test_recipe(self):
+        self.assertConstantQueries(
+            lambda: ('get', f'/api/recipes/{self.recipe.id}/')
+        )
+
+    def test_feed(self):
+        self.assertConstantQueries(
+            lambda: ('get', f'/api/recipes/feed/?{LIMIT}')
+        )
+
+    def test_recipe_create(self):
+        self.assertConstantQueries(
+            lambda: ('post', '/api/recipes/', self.recipe_payload()),
+            self.grow_ingredients, WRITE_SIZES
+        )
+
+    def test_recipe_update(self):
+        self.assertConstantQueries(
+            lambda: ('patch', f'/api/recipes/{self.own_recipe.id}/',
+                     self.recipe_payload()),
+            self.grow_ingredients, WRITE_SIZES
+        )
+
+    def test_recipe_delete(self):
+        def create_own_recipe():
+            self.own_recipe = self.create_recipe(self.user)
+
+        self.assertConstantQueries(
+            lambda: ('delete', f'/api/recipes/{self.own_recipe.id}/'),
+            self.grow_with(create_own_recipe)
+        )
+
+    def test_download_shopping_cart(self):
+        self.assertConstantQueries(
+            lambda: ('get', '/api/recipes/download_shopping_cart/'),
+            self.grow_with(lambda: bump_cart_generation([self.user.id]))
+        )
+
+    def test_download_shopping_cart_csv(self):
+        self.assertConstantQueries(
+            lambda: ('get', '/api/recipes/download_shopping_cart/?format=csv'),
+            self.grow_with(lambda: bump_cart_generation([self.user.id]))
+        )
+
+    def test_favorite_add(self):
+        self.assertConstantQueries(
+            lambda: ('get', f'/api/recipes/{self.spare_recipe.id}/favorite/')
+        )
+
+    def test_favorite_delete(self):
+        def add():
+            Favorite.objects.create(user=self.user, recipe=self.spare_recipe)
+
+        add()
+        self.assertConstantQueries(
+            lambda: ('delete',
+                     f'/api/recipes/{self.spare_recipe.id}/favorite/'),
+            self.grow_with(add)
+        )
+
+    def test_shopping_cart_add(self):
+        self.assertConstantQueries(lambda: (
+            'get', f'/api/recipes/{self.spare_recipe.id}/shopping_cart/'
+        ))
+
+    def test_shopping_cart_delete(self):
+        def add():
+            ShoppingCart.objects.create(
+                user=self.user, recipe=self.spare_recipe
+            )
+
+        add()
+        self.assertConstantQueries(
+            lambda: ('delete',
+                     f'/api/recipes/{self.spare_recipe.id}/shopping_cart/'),
+            self.grow_with(add)
+        )
+
+    def test_favorite_batch_add(self):
+        self.assertConstantQueries(lambda: (
+            'post', '/api/recipes/favorite/', {'recipes': self.batch_ids()}
+        ))
+
+    def test_favorite_batch_remove(self):
+        self.assertConstantQueries(lambda: (
+            'delete', '/api/recipes/favorite/', {'recipes': self.batch_ids()}
+        ))
+
+    def test_shopping_cart_batch_add(self):
+        self.assertConstantQueries(lambda: (
+            'post', '/api/recipes/shopping_cart/',
+            {'recipes': self.batch_ids()}
+        ))
+
+    def test_shopping_cart_batch_remove(self):
+        self.assertConstantQueries(lambda: (
+            'delete', '/api/recipes/shopping_cart/',
+            {'recipes': self.batch_ids()}
+        ))
+
+    def test_slow_requests(self):
+        self.assertConstantQueries(
+            lambda: ('get', '/api/profiling/slow_requests/')
+        )
+
+
+class UserRoutesQueryBudgetTest(QueryBudgetTestCase):
+    """
+    Routes of users/urls.py, djoser ones included, run the same
+    number of queries whatever the size of the data.
+    """
+
+    def test_subscriptions(self):
+        self.assertConstantQueries(
+            lambda: ('get', f'/api/users/subscriptions/?{LIMIT}')
+        )
+
+    def test_subscribe(self):
+        self.assertConstantQueries(
+            lambda: ('get', f'/api/users/{self.spare_author.id}/subscribe/')
+        )
+
+    def test_unsubscribe(self):
+        def follow():
+            Follow.objects.create(user=self.user, author=self.spare_author)
+
+        follow()
+        self.assertConstantQueries(
+            lambda: ('delete',
+                     f'/api/users/{self.spare_author.id}/subscribe/'),
+            self.grow_with(follow)
+        )
+
+    def test_users(self):
+        self.assertConstantQueries(lambda: ('get', f'/api/users/?{LIMIT}'))
+
+    def test_user(self):
+        self.assertConstantQueries(
+            lambda: ('get', f'/api/users/{self.recipe.author_id}/')
+        )
+
+    def test_users_me(self):
+        self.assertConstantQueries(lambda: ('get', '/api/users/me/'))
+
+    def test_user_create(self):
+        def payload():
+            self.created += 1
+            return {
+                'email': f'new_{self.created}@example.com',
+                'username': f'new_{self.created}',
+                'first_name': 'Budget',
+                'last_name': 'new',
+                'password': 'Budget-password-0',
+            }
+
+        self.assertConstantQueries(lambda: ('post', '/api/users/', payload()))
+
+    def test_set_password(self):
+        def payload():
+            self.created += 1
+            current, self.password = (
+                self.password, f'Budget-password-{self.created}'
+            )
+            return {'current_password': current,
+                    'new_password': self.password}
+
+        self.assertConstantQueries(
+            lambda: ('post', '/api/users/set_password/', payload())
+        )
+
+    def test_token_login(self):
+        self.assertConstantQueries(lambda: (
+            'post', '/api/auth/token/login/',
+            {'email': self.user.email, 'password': self.password}
+        ))
+
+    def test_token_logout(self):
+        self.assertConstantQueries(
+            lambda: ('post', '/api/auth/token/logout/'),
+            self.grow_with(self.login)
+        )
@@ -0,0 +1,42 @@
+from .base import QueryBudgetTestCase
+
+# Count, page with author and user flags, prefetched tags and
+# ingredients; the detail skips the count.
+LIST_QUERIES = 4
+DETAIL_QUERIES = 3
+
+
+class RecipeQueriesTest(QueryBudgetTestCase):
+    """
+    The recipe list and detail run a fixed number of queries, whatever
+    the number of recipes on the page or of their ingredients.
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.grow(10)
+        # The first request authenticates against the database; later
+        # ones use the token cache.
+        self.client.get('/api/users/me/')
+
+    def test_list(self):
+        for limit in (1, 10):
+            with self.subTest(limit=limit):
+                with self.assertNumQueries(LIST_QUERIES):
+                    response = self.client.get(
+                        '/api/recipes/', {'limit': limit}
+                    )
+                self.assertEqual(len(response.data['results']), limit)
+
+    def test_retrieve(self):
+        small = self.recipe
+        self.grow_ingredients(30)
+        large = self.create_recipe(self.user)
+        for recipe in (small, large):
+            with self.subTest(ingredients=recipe.ingredients.count()):
+                with self.assertNumQueries(DETAIL_QUERIES):
+                    response = self.client.get(f'/api/recipes/{recipe.id}/')
+                self.assertEqual(
+                    len(response.data['ingredients']),
+                    recipe.ingredients.count()
+                )
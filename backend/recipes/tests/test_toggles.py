@@ -0,0 +1,90 @@
+from recipes.models import Favorite, Recipe, ShoppingCart
+
+from .base import QueryBudgetTestCase
+
+MISSING_ID = 10 ** 9
+
+
+class RecipeRelationTest(QueryBudgetTestCase):
+    """
+    Adding and removing favorites and cart items answers with the
+    documented status codes and keeps the recipe counters in step.
+    """
+
+    relations = (
+        ('favorite', Favorite, 'favorites_count'),
+        ('shopping_cart', ShoppingCart, 'in_carts_count'),
+    )
+
+    def counter(self, recipe, field):
+        return Recipe.objects.values_list(field, flat=True).get(pk=recipe.pk)
+
+    def test_single(self):
+        recipe = self.spare_recipe
+        for route, model, field in self.relations:
+            url = f'/api/recipes/{recipe.id}/{route}/'
+            with self.subTest(route=route):
+                self.assertEqual(self.client.get(url).status_code, 201)
+                self.assertEqual(self.client.get(url).status_code, 400)
+                self.assertEqual(self.counter(recipe, field), 1)
+                self.assertTrue(model.objects.filter(
+                    user=self.user, recipe=recipe
+                ).exists())
+
+                self.assertEqual(self.client.delete(url).status_code, 204)
+                self.assertEqual(self.client.delete(url).status_code, 400)
+                self.assertEqual(self.counter(recipe, field), 0)
+                self.assertFalse(model.objects.filter(
+                    user=self.user, recipe=recipe
+                ).exists())
+
+    def test_single_missing_recipe(self):
+        for route, _, _ in self.relations:
+            url = f'/api/recipes/{MISSING_ID}/{route}/'
+            with self.subTest(route=route):
+                self.assertEqual(self.client.get(url).status_code, 404)
+                self.assertEqual(self.client.delete(url).status_code, 404)
+
+    def test_batch(self):
+        # self.recipe is already favorited and carted by grow().
+        ids = [self.spare_recipe.id, self.recipe.id, MISSING_ID]
+        for route, model, field in self.relations:
+            url = f'/api/recipes/{route}/'
+            with self.subTest(route=route):
+                response = self.client.post(
+                    url, {'recipes': ids}, format='json'
+                )
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(response.data['results'], [
+                    {'id': self.spare_recipe.id, 'status': 'added'},
+                    {'id': self.recipe.id, 'status': 'exists'},
+                    {'id': MISSING_ID, 'status': 'not_found'},
+                ])
+                self.assertEqual(self.counter(self.spare_recipe, field), 1)
+                self.assertEqual(self.counter(self.recipe, field), 1)
+
+                response = self.client.delete(
+                    url, {'recipes': [self.spare_recipe.id]}, format='json'
+                )
+                self.assertEqual(response.data['results'], [
+                    {'id': self.spare_recipe.id, 'status': 'removed'},
+                ])
+                response = self.client.delete(
+                    url, {'recipes': ids}, format='json'
+                )
+                self.assertEqual(response.data['results'], [
+                    {'id': self.spare_recipe.id, 'status': 'missing'},
+                    {'id': self.recipe.id, 'status': 'removed'},
+                    {'id': MISSING_ID, 'status': 'not_found'},
+                ])
+                self.assertEqual(self.counter(self.spare_recipe, field), 0)
+                self.assertEqual(self.counter(self.recipe, field), 0)
+                self.assertFalse(model.objects.filter(
+                    user=self.user, recipe__in=ids
+                ).exists())
+
+    def test_batch_requires_ids(self):
+        response = self.client.post(
+            '/api/recipes/favorite/', {'recipes': []}, format='json'
+        )
+        self.assertEqual(response.status_code, 400)
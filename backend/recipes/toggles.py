@@ -0,0 +1,120 @@
+from django.db import connections, router, transaction
+from django.db.models import Q, sql
+from django.db.models.signals import post_delete, post_save
+
+from .counters import deferred_counters
+
+
+def insert_returning(model, instances):
+    """
+    Inserts the rows with INSERT ... ON CONFLICT DO NOTHING RETURNING
+    and sends post_save only for the rows this statement actually
+    inserted. A row that already exists, or was inserted by
+    a concurrent request, is skipped without failing on the unique
+    constraint, so counters and caches maintained by signal receivers
+    are changed once per row. Returns the inserted rows.
+    """
+    if not instances:
+        return []
+    using = router.db_for_write(model)
+    connection = connections[using]
+    opts = model._meta
+    query = sql.InsertQuery(model, ignore_conflicts=True)
+    query.insert_values(
+        [field for field in opts.concrete_fields
+         if field is not opts.auto_field],
+        instances
+    )
+    returning = ', '.join(
+        connection.ops.quote_name(field.column)
+        for field in opts.concrete_fields
+    )
+    with transaction.atomic(using=using, savepoint=False):
+        rows = []
+        with connection.cursor() as cursor:
+            for statement, params in query.get_compiler(using).as_sql():
+                cursor.execute(f'{statement} RETURNING {returning}', params)
+                rows.extend(cursor.fetchall())
+        attnames = [field.attname for field in opts.concrete_fields]
+        created = [model.from_db(using, attnames, row) for row in rows]
+        for instance in created:
+            post_save.send(
+                sender=model, instance=instance, created=True,
+                update_fields=None, raw=False, using=using
+            )
+    return created
+
+
+def add_relation(model, **fields):
+    """
+    Inserts the row. Returns True if this call created it.
+    """
+    return bool(insert_returning(model, [model(**fields)]))
+
+
+def delete_returning(model, **fields):
+    """
+    Deletes matching rows with DELETE ... RETURNING and sends
+    post_delete for the rows this statement actually deleted. A row
+    deleted by a concurrent request is not returned, so counters,
+    feeds and caches maintained by signal receivers are changed once
+    per row. Meant for relation tables nothing else points at: no
+    cascades are collected.
+    """
+    using = router.db_for_write(model)
+    connection = connections[using]
+    opts = model._meta
+    query = sql.DeleteQuery(model)
+    query.add_q(Q(**fields))
+    statement, params = query.get_compiler(using).as_sql()
+    returning = ', '.join(
+        connection.ops.quote_name(field.column)
+        for field in opts.concrete_fields
+    )
+    with transaction.atomic(using=using, savepoint=False):
+        with connection.cursor() as cursor:
+            cursor.execute(f'{statement} RETURNING {returning}', params)
+            rows = cursor.fetchall()
+        attnames = [field.attname for field in opts.concrete_fields]
+        instances = [model.from_db(using, attnames, row) for row in rows]
+        for instance in instances:
+            post_delete.send(
+                sender=model, instance=instance, using=using
+            )
+    return instances
+
+
+def remove_relation(model, **fields):
+    """
+    Deletes the matching row. Returns True if this call deleted it.
+    """
+    return bool(delete_returning(model, **fields))
+
+
+def add_relations(model, user, recipe_ids):
+    """
+    Adds the recipes to a user collection with one insert.
+    Counter changes of all rows are applied with a single UPDATE.
+    Returns ids of the recipes actually added.
+    """
+    with transaction.atomic(using=router.db_for_write(model)):
+        with deferred_counters():
+            relations = insert_returning(model, [
+                model(user=user, recipe_id=recipe_id)
+                for recipe_id in recipe_ids
+            ])
+    return {relation.recipe_id for relation in relations}
+
+
+def remove_relations(model, user, recipe_ids):
+    """
+    Removes the recipes from a user collection with one delete.
+    Counter changes of all rows are applied with a single UPDATE.
+    Returns ids of the recipes actually removed.
+    """
+    with transaction.atomic(using=router.db_for_write(model)):
+        with deferred_counters():
+            relations = delete_returning(
+                model, user=user, recipe_id__in=recipe_ids
+            )
+    return {relation.recipe_id for relation in relations}
@@ -2,8 +2,10 @@ from django.conf.urls import include
 from django.urls import path
 from rest_framework.routers import DefaultRouter
 
-from .views import (FavoriteViewSet, IngredientViewSet, RecipeViewSet,
-                    ShoppingCartViewSet, TagViewSet, download_shopping_cart)
+from .views import (DownloadShoppingCartViewSet, FavoriteBatchViewSet,
+                    FavoriteViewSet, IngredientViewSet, RecipeViewSet,
+                    ShoppingCartBatchViewSet, ShoppingCartViewSet,
+                    SlowRequestsViewSet, TagViewSet)
 
 v1_router = DefaultRouter()
 v1_router.register(r'tags', TagViewSet, basename='tags')
@@ -13,9 +15,19 @@ v1_router.register(r'recipes', RecipeViewSet, basename='recipes')
 urlpatterns = [
     path(
         'recipes/download_shopping_cart/',
-        download_shopping_cart,
+        DownloadShoppingCartViewSet.as_view(),
         name='download'
     ),
+    path(
+        'recipes/favorite/',
+        FavoriteBatchViewSet.as_view(),
+        name='favorite_batch'
+    ),
+    path(
+        'recipes/shopping_cart/',
+        ShoppingCartBatchViewSet.as_view(),
+        name='shopping_cart_batch'
+    ),
     path(
         'recipes/<int:recipe_id>/favorite/',
         FavoriteViewSet.as_view(),
@@ -26,5 +38,10 @@ urlpatterns = [
         ShoppingCartViewSet.as_view(),
         name='shopping_cart'
     ),
+    path(
+        'profiling/slow_requests/',
+        SlowRequestsViewSet.as_view(),
+        name='slow_requests'
+    ),
     path('', include(v1_router.urls)),
 ]
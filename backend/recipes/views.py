@@ -1,19 +1,39 @@
-from django.http import HttpResponse
+import logging
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.db.models import F, Sum
+from django.http import (HttpResponse, HttpResponseNotModified,
+                         StreamingHttpResponse)
 from django.shortcuts import get_object_or_404
+from django.utils.cache import patch_cache_control
+from django.utils.http import parse_etags, quote_etag
 from rest_framework import status, viewsets
-from rest_framework.decorators import api_view
-from rest_framework.permissions import AllowAny, IsAuthenticated
+from rest_framework.decorators import action
+from rest_framework.permissions import AllowAny, IsAdminUser, IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
+from .caches import cache_chunks, get_cart_generation, shopping_list_key
+from .exporters import EXPORTERS
 from .filters import IngredientFilter, RecipeFilter
+from .indexes import ingredient_index
 from .models import (Favorite, Ingredient, IngredientInRecipe, Recipe,
                      ShoppingCart, Tag)
-from .paginators import CartPaginator
+from .negotiation import IgnoreFormatContentNegotiation
+from .paginators import (CartPaginator, FeedKeysetPaginator,
+                         KeysetPaginationMixin)
 from .permissions import AdminOrAuthorOrReadOnly
+from .profiling import get_slow_requests
 from .serializers import (CreateRecipeSerializer, FavoriteSerializer,
-                          IngredientSerializer, ShoppingCartSerializer,
-                          ShowRecipeSerializer, TagSerializer)
+                          IngredientSerializer, RecipeIdsSerializer,
+                          ShoppingCartSerializer, ShowRecipeSerializer,
+                          TagSerializer)
+from .toggles import (add_relation, add_relations, remove_relation,
+                      remove_relations)
+
+logger = logging.getLogger(__name__)
 
 
 class TagViewSet(viewsets.ReadOnlyModelViewSet):
@@ -33,116 +53,234 @@ class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
     search_fields = ('name', )
     pagination_class = None
 
+    def list(self, request, *args, **kwargs):
+        name = request.query_params.get('name')
+        if not name:
+            return super().list(request, *args, **kwargs)
+        try:
+            limit = int(request.query_params.get(
+                'limit', settings.INGREDIENT_SEARCH_LIMIT
+            ))
+        except ValueError:
+            limit = settings.INGREDIENT_SEARCH_LIMIT
+        limit = max(1, min(limit, settings.INGREDIENT_SEARCH_MAX_LIMIT))
+        serializer = self.get_serializer(
+            ingredient_index.search(name, limit), many=True
+        )
+        return Response(serializer.data)
+
 
-class RecipeViewSet(viewsets.ModelViewSet):
+class RecipeViewSet(KeysetPaginationMixin, viewsets.ModelViewSet):
 
     queryset = Recipe.objects.all()
     permission_classes = [AdminOrAuthorOrReadOnly, ]
     filter_class = RecipeFilter
     pagination_class = CartPaginator
+    keyset_ordering_params = ('ordering', 'search')
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.request.method != 'GET':
+            return queryset
+        return queryset.with_related().with_user_flags(
+            self.request.user
+        )
 
     def get_serializer_class(self):
         if self.request.method == 'GET':
             return ShowRecipeSerializer
         return CreateRecipeSerializer
 
+    @action(
+        detail=False,
+        methods=['get'],
+        permission_classes=[IsAuthenticated, ]
+    )
+    def feed(self, request):
+        paginator = FeedKeysetPaginator()
+        page = paginator.paginate_queryset(
+            self.get_queryset(), request, view=self
+        )
+        serializer = self.get_serializer(page, many=True)
+        return paginator.get_paginated_response(serializer.data)
+
     def get_serializer_context(self):
         context = super().get_serializer_context()
         context.update({'request': self.request})
         return context
 
 
-class FavoriteViewSet(APIView):
+class RecipeRelationViewSet(APIView):
+    """
+    Adds a recipe to a user collection with GET and removes it
+    with DELETE, in one or two queries and without races.
+    """
 
     permission_classes = [IsAuthenticated, ]
+    model = None
+    serializer_class = None
+    exists_message = None
 
     def get(self, request, recipe_id):
-        user = request.user
-        data = {
-            "user": user.id,
-            "recipe": recipe_id,
-        }
-        if Favorite.objects.filter(user=user, recipe__id=recipe_id).exists():
+        recipe = get_object_or_404(Recipe, id=recipe_id)
+        if not add_relation(self.model, user=request.user, recipe=recipe):
             return Response(
-                {"Ошибка": "Уже в избранном"},
+                {"Ошибка": self.exists_message},
                 status=status.HTTP_400_BAD_REQUEST
             )
-        serializer = FavoriteSerializer(
-            data=data,
+        serializer = self.serializer_class(
+            self.model(user=request.user, recipe=recipe),
             context={"request": request}
         )
-        serializer.is_valid(raise_exception=True)
-        serializer.save()
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
     def delete(self, request, recipe_id):
-        user = request.user
-        recipe = get_object_or_404(Recipe, id=recipe_id)
-        if not Favorite.objects.filter(user=user, recipe=recipe).exists():
-            return Response(status=status.HTTP_400_BAD_REQUEST)
-        Favorite.objects.get(user=user, recipe=recipe).delete()
-        return Response(status=status.HTTP_204_NO_CONTENT)
+        if remove_relation(self.model, user=request.user, recipe=recipe_id):
+            return Response(status=status.HTTP_204_NO_CONTENT)
+        get_object_or_404(Recipe, id=recipe_id)
+        return Response(status=status.HTTP_400_BAD_REQUEST)
+
 
+class FavoriteViewSet(RecipeRelationViewSet):
 
-class ShoppingCartViewSet(APIView):
+    model = Favorite
+    serializer_class = FavoriteSerializer
+    exists_message = "Уже в избранном"
+
+
+class ShoppingCartViewSet(RecipeRelationViewSet):
+
+    model = ShoppingCart
+    serializer_class = ShoppingCartSerializer
+    exists_message = "Уже есть в корзине"
+
+
+class RecipeRelationBatchViewSet(APIView):
+    """
+    Adds recipes to a user collection with POST and removes them
+    with DELETE. Takes {"recipes": [id, ...]} and returns the result
+    for every id.
+    """
 
     permission_classes = [IsAuthenticated, ]
+    model = None
 
-    def get(self, request, recipe_id):
+    def get_recipe_ids(self, request):
+        serializer = RecipeIdsSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        recipe_ids = serializer.validated_data['recipes']
+        found = Recipe.objects.only('id').in_bulk(recipe_ids)
+        return recipe_ids, found
+
+    def get_response(self, recipe_ids, found, changed, changed_status,
+                     unchanged_status):
+        results = []
+        for recipe_id in recipe_ids:
+            if recipe_id not in found:
+                result = 'not_found'
+            elif recipe_id in changed:
+                result = changed_status
+            else:
+                result = unchanged_status
+            results.append({'id': recipe_id, 'status': result})
+        return Response({'results': results})
+
+    def post(self, request):
+        recipe_ids, found = self.get_recipe_ids(request)
+        added = add_relations(self.model, request.user, list(found))
+        return self.get_response(recipe_ids, found, added, 'added', 'exists')
+
+    def delete(self, request):
+        recipe_ids, found = self.get_recipe_ids(request)
+        removed = remove_relations(self.model, request.user, list(found))
+        return self.get_response(
+            recipe_ids, found, removed, 'removed', 'missing'
+        )
+
+
+class FavoriteBatchViewSet(RecipeRelationBatchViewSet):
+
+    model = Favorite
+
+
+class ShoppingCartBatchViewSet(RecipeRelationBatchViewSet):
+
+    model = ShoppingCart
+
+
+class DownloadShoppingCartViewSet(APIView):
+
+    permission_classes = [IsAuthenticated, ]
+    content_negotiation_class = IgnoreFormatContentNegotiation
+
+    def get(self, request):
         user = request.user
-        data = {
-            "user": user.id,
-            "recipe": recipe_id,
-        }
-        shopping_cart_exist = ShoppingCart.objects.filter(
-            user=user,
-            recipe__id=recipe_id
-        ).exists()
-        if shopping_cart_exist:
+        export_format = request.query_params.get('format', 'txt')
+        if export_format not in EXPORTERS:
             return Response(
-                {"Ошибка": "Уже есть в корзине"},
+                {"Ошибка": f"Доступные форматы: {', '.join(EXPORTERS)}"},
                 status=status.HTTP_400_BAD_REQUEST
             )
-        context = {'request': request}
-        serializer = ShoppingCartSerializer(data=data, context=context)
-        serializer.is_valid(raise_exception=True)
-        serializer.save()
-        return Response(serializer.data, status=status.HTTP_201_CREATED)
+        exporter_class = EXPORTERS[export_format]
+        try:
+            exporter_class.check()
+        except ImproperlyConfigured as error:
+            logger.error('Формат %s недоступен: %s', export_format, error)
+            return Response(
+                {"Ошибка": f"Формат {export_format} временно недоступен"},
+                status=status.HTTP_503_SERVICE_UNAVAILABLE
+            )
+        generation = get_cart_generation(user.id)
+        etag = quote_etag(f'{user.id}-{generation}-{export_format}')
+        if_none_match = request.META.get('HTTP_IF_NONE_MATCH', '')
+        if etag in parse_etags(if_none_match):
+            response = HttpResponseNotModified()
+        else:
+            response = self.get_shopping_list_response(
+                user, exporter_class,
+                shopping_list_key(user.id, generation, export_format)
+            )
+        response['ETag'] = etag
+        patch_cache_control(response, private=True, no_cache=True)
+        return response
 
-    def delete(self, request, recipe_id):
-        user = request.user
-        recipe = get_object_or_404(Recipe, id=recipe_id)
-        if not ShoppingCart.objects.filter(user=user, recipe=recipe).exists():
-            return Response(status=status.HTTP_400_BAD_REQUEST)
-        ShoppingCart.objects.get(user=user, recipe=recipe).delete()
-        return Response(status=status.HTTP_204_NO_CONTENT)
-
-
-@api_view(['GET'])
-def download_shopping_cart(request):
-
-    user = request.user
-    shopping_cart = user.shopping_cart.all()
-    buying_list = {}
-    for record in shopping_cart:
-        recipe = record.recipe
-        ingredients = IngredientInRecipe.objects.filter(recipe=recipe)
-        for ingredient in ingredients:
-            amount = ingredient.amount
-            name = ingredient.ingredient.name
-            measurement_unit = ingredient.ingredient.measurement_unit
-            if name not in buying_list:
-                buying_list[name] = {
-                    'measurement_unit': measurement_unit,
-                    'amount': amount
-                }
-            else:
-                buying_list[name]['amount'] = (buying_list[name]['amount']
-                                               + amount)
-    wishlist = []
-    for name, data in buying_list.items():
-        wishlist.append(
-            f"{name} - {data['amount']} ({data['measurement_unit']} \n")
-    response = HttpResponse(wishlist, content_type='text/plain')
-    response['Content-Disposition'] = 'attachment; filename="wishlist.txt"'
-    return response
+    def get_shopping_list_response(self, user, exporter_class, cache_key):
+        content = cache.get(cache_key)
+        if content is not None:
+            response = HttpResponse(
+                content, content_type=exporter_class.content_type
+            )
+        else:
+            buying_list = IngredientInRecipe.objects.filter(
+                recipe__shopping_cart__user=user
+            ).values(
+                name=F('ingredient__name'),
+                measurement_unit=F('ingredient__measurement_unit')
+            ).annotate(
+                amount=Sum('amount')
+            ).order_by('name')
+            exporter = exporter_class(buying_list.iterator())
+            response = StreamingHttpResponse(
+                cache_chunks(cache_key, exporter),
+                content_type=exporter.content_type
+            )
+        response['Content-Disposition'] = (
+            f'attachment; filename="wishlist.{exporter_class.extension}"'
+        )
+        return response
+
+
+class SlowRequestsViewSet(APIView):
+    """
+    Shows the latest slow requests recorded by
+    RequestProfilingMiddleware, newest first.
+    """
+
+    permission_classes = [IsAdminUser, ]
+
+    def get(self, request):
+        return Response({
+            'enabled': settings.REQUEST_PROFILING,
+            'slow_ms': settings.REQUEST_PROFILING_SLOW_MS,
+            'results': get_slow_requests(),
+        })
@@ -5,7 +5,8 @@ from .models import CustomUser, Follow
 
 class CustomUserAdmin(admin.ModelAdmin):
     list_display = ('id', 'username', 'email',
-                    'first_name', 'last_name', 'is_staff'
+                    'first_name', 'last_name', 'is_staff',
+                    'recipes_count', 'followers_count'
                     )
     list_filter = ('email', 'username')
     search_fields = ('username',)
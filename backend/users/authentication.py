@@ -0,0 +1,123 @@
+import copy
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+from rest_framework.permissions import SAFE_METHODS
+
+SHARED_CACHE_PREFIX = 'auth_token:'
+
+
+class TokenCache:
+    """
+    Bounded in-process LRU of token key -> user. Entries expire after
+    'ttl' seconds, which limits how long another process may keep
+    a token that was deleted elsewhere.
+    """
+
+    def __init__(self, max_size, ttl):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            user, expires = entry
+            if expires <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return user
+
+    def set(self, key, user):
+        with self._lock:
+            self._entries[key] = (user, time.monotonic() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def delete(self, keys):
+        with self._lock:
+            for key in keys:
+                self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+token_cache = TokenCache(
+    settings.TOKEN_AUTH_CACHE_SIZE, settings.TOKEN_AUTH_CACHE_TTL
+)
+
+
+def get_shared_cache():
+    if settings.TOKEN_AUTH_SHARED_CACHE:
+        return caches[settings.TOKEN_AUTH_SHARED_CACHE]
+    return None
+
+
+def invalidate_tokens(keys):
+    """
+    Forgets the tokens in this process and in the shared cache.
+    """
+    keys = list(keys)
+    if not keys:
+        return
+    token_cache.delete(keys)
+    shared = get_shared_cache()
+    if shared is not None:
+        shared.delete_many([SHARED_CACHE_PREFIX + key for key in keys])
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """
+    TokenAuthentication that looks the token up in the in-process
+    cache, then in the shared cache, and only then in the database.
+    Inactive users are never cached, so they get 401 as before.
+
+    Only safe requests get a cached user. Other requests may save
+    request.user, so they load it from the database and refresh the
+    cache with it.
+    """
+
+    use_cache = True
+
+    def authenticate(self, request):
+        self.use_cache = request.method in SAFE_METHODS
+        return super().authenticate(request)
+
+    def authenticate_credentials(self, key):
+        user = self.get_cached_user(key) if self.use_cache else None
+        if user is not None:
+            # Every request gets its own copy: views may set
+            # attributes on request.user.
+            user = copy.copy(user)
+            return user, Token(key=key, user=user)
+
+        user, token = super().authenticate_credentials(key)
+        token_cache.set(key, user)
+        shared = get_shared_cache()
+        if shared is not None:
+            shared.set(
+                SHARED_CACHE_PREFIX + key, user,
+                settings.TOKEN_AUTH_CACHE_TTL
+            )
+        return copy.copy(user), token
+
+    def get_cached_user(self, key):
+        user = token_cache.get(key)
+        shared = get_shared_cache()
+        if user is None and shared is not None:
+            user = shared.get(SHARED_CACHE_PREFIX + key)
+            if user is not None:
+                token_cache.set(key, user)
+        return user
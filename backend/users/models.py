@@ -2,10 +2,12 @@ from django.contrib.auth.models import AbstractBaseUser, PermissionsMixin
 from django.db import models
 from django.utils import timezone
 
+from recipes.counters import CounterFieldsMixin
+
 from .managers import CustomUserManager
 
 
-class CustomUser(AbstractBaseUser, PermissionsMixin):
+class CustomUser(CounterFieldsMixin, AbstractBaseUser, PermissionsMixin):
     """
     Describes CustomUser model, which includes
     'first_name', 'last_name' and 'email'
@@ -32,11 +34,19 @@ class CustomUser(AbstractBaseUser, PermissionsMixin):
     date_joined = models.DateTimeField(
         default=timezone.now, verbose_name='Дата регистрации'
     )
+    recipes_count = models.PositiveIntegerField(
+        default=0, editable=False, verbose_name='Количество рецептов'
+    )
+    followers_count = models.PositiveIntegerField(
+        default=0, editable=False, verbose_name='Количество подписчиков'
+    )
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = ['first_name', 'last_name', 'username']
 
     objects = CustomUserManager()
 
+    counter_fields = ('recipes_count', 'followers_count')
+
     class Meta:
         ordering = ('username',)
         verbose_name = 'Пользователь'
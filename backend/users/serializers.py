@@ -3,14 +3,17 @@ from djoser.serializers import UserSerializer
 from rest_framework import serializers
 
 from foodgram.settings import RECIPES_LIMIT
+from recipes.images import rendition_urls
 from recipes.models import Recipe
+from recipes.profiling import TimedSerializerMixin
+from recipes.relations import RelationsListSerializer, get_relations
 
 from .models import Follow
 
 User = get_user_model()
 
 
-class UserSerializerModified(UserSerializer):
+class UserSerializerModified(TimedSerializerMixin, UserSerializer):
     """
     Describes modified UserSerializer, which includes
     'is_subscribed' field
@@ -20,13 +23,23 @@ class UserSerializerModified(UserSerializer):
 
     class Meta(UserSerializer.Meta):
         fields = ('email', 'id', 'username',
-                  'first_name', 'last_name', 'is_subscribed')
+                  'first_name', 'last_name', 'is_subscribed',
+                  'recipes_count', 'followers_count')
+        read_only_fields = UserSerializer.Meta.read_only_fields + (
+            'recipes_count', 'followers_count'
+        )
+        list_serializer_class = RelationsListSerializer
+
+    def load_relations(self, relations, users):
+        relations.load('following', [
+            user.id for user in users if not hasattr(user, 'is_subscribed')
+        ])
 
     def get_is_subscribed(self, obj):
-        request = self.context.get('request')
-        if request is None or request.user.is_anonymous:
-            return False
-        return Follow.objects.filter(user=request.user, author=obj).exists()
+        if hasattr(obj, 'is_subscribed'):
+            return obj.is_subscribed
+        relations = get_relations(self.context.get('request'))
+        return relations is not None and relations.has('following', obj.id)
 
 
 class MyAuthTokenSerializer(serializers.Serializer):
@@ -57,12 +70,26 @@ class MyAuthTokenSerializer(serializers.Serializer):
         return attrs
 
 
+def get_recipes_limit(request):
+    """
+    Returns the number of recipe previews requested with the
+    'recipes_limit' query parameter, RECIPES_LIMIT by default.
+    """
+    if request is None:
+        return RECIPES_LIMIT
+    try:
+        return max(0, int(request.query_params['recipes_limit']))
+    except (KeyError, ValueError):
+        return RECIPES_LIMIT
+
+
 class ShowRecipeAddedSerializer(serializers.ModelSerializer):
     image = serializers.SerializerMethodField()
+    images = serializers.SerializerMethodField()
 
     class Meta:
         model = Recipe
-        fields = ('id', 'name', 'image', 'cooking_time')
+        fields = ('id', 'name', 'image', 'images', 'cooking_time')
         read_only_fields = fields
 
     def get_image(self, obj):
@@ -70,6 +97,9 @@ class ShowRecipeAddedSerializer(serializers.ModelSerializer):
         photo_url = obj.image.url
         return request.build_absolute_uri(photo_url)
 
+    def get_images(self, obj):
+        return rendition_urls(obj, self.context.get('request'))
+
 
 class FollowRecipeSerializer(serializers.ModelSerializer):
     """
@@ -81,35 +111,41 @@ class FollowRecipeSerializer(serializers.ModelSerializer):
         fields = ('id', 'name', 'image', 'cooking_time')
 
 
-class ShowFollowSerializer(serializers.ModelSerializer):
+class ShowFollowSerializer(TimedSerializerMixin,
+                           serializers.ModelSerializer):
     is_subscribed = serializers.SerializerMethodField()
     recipes = serializers.SerializerMethodField()
-    recipes_count = serializers.SerializerMethodField()
 
     class Meta:
         model = User
         fields = ('email', 'id', 'username', 'first_name', 'last_name',
-                  'is_subscribed', 'recipes', 'recipes_count')
+                  'is_subscribed', 'recipes', 'recipes_count',
+                  'followers_count')
         read_only_fields = fields
+        list_serializer_class = RelationsListSerializer
+
+    def load_relations(self, relations, users):
+        relations.load('following', [
+            user.id for user in users if not hasattr(user, 'is_subscribed')
+        ])
 
     def get_is_subscribed(self, obj):
-        request = self.context.get('request')
-        if request is None or request.user.is_anonymous:
-            return False
-        return obj.follower.filter(user=obj, author=request.user).exists()
+        if hasattr(obj, 'is_subscribed'):
+            return obj.is_subscribed
+        relations = get_relations(self.context.get('request'))
+        return relations is not None and relations.has('following', obj.id)
 
     def get_recipes(self, obj):
-        recipes = obj.recipes.all()[:RECIPES_LIMIT]
         request = self.context.get('request')
+        recipes = getattr(obj, 'recipe_previews', None)
+        if recipes is None:
+            recipes = obj.recipes.all()[:get_recipes_limit(request)]
         return ShowRecipeAddedSerializer(
             recipes,
             many=True,
             context={'request': request}
         ).data
 
-    def get_recipes_count(self, obj):
-        return obj.recipes.count()
-
 
 class FollowerRecipeSerializerDetails(serializers.ModelSerializer):
     image = serializers.SerializerMethodField()
@@ -138,14 +174,12 @@ class FollowSerializer(serializers.ModelSerializer):
         )
 
     def validate(self, data):
-        user = self.context.get('request').user
+        request = self.context.get('request')
+        user = request.user
         author_id = data['author'].id
-        follow_exist = Follow.objects.filter(
-            user=user,
-            author__id=author_id
-        ).exists()
+        follow_exist = get_relations(request).has('following', author_id)
 
-        if self.context.get('request').method == 'GET':
+        if request.method == 'GET':
             if user.id == author_id or follow_exist:
                 raise serializers.ValidationError(
                     'Подписка существует')
@@ -0,0 +1,43 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from recipes.counters import change_counter
+
+from .authentication import invalidate_tokens
+from .models import CustomUser, Follow
+
+
+@receiver(post_save, sender=Follow)
+def follow_created(sender, instance, created, **kwargs):
+    if created:
+        change_counter(
+            CustomUser.objects.filter(pk=instance.author_id),
+            'followers_count', 1
+        )
+
+
+@receiver(post_delete, sender=Follow)
+def follow_deleted(sender, instance, **kwargs):
+    change_counter(
+        CustomUser.objects.filter(pk=instance.author_id),
+        'followers_count', -1
+    )
+
+
+@receiver(post_delete, sender=Token)
+def token_deleted(sender, instance, **kwargs):
+    invalidate_tokens([instance.key])
+
+
+@receiver(post_save, sender=CustomUser)
+def user_saved(sender, instance, update_fields, **kwargs):
+    """
+    Cached users are replaced on every save, so a change of
+    'is_active' takes effect on the next request.
+    """
+    if update_fields is not None and set(update_fields) == {'last_login'}:
+        return
+    invalidate_tokens(
+        Token.objects.filter(user=instance).values_list('key', flat=True)
+    )
@@ -0,0 +1,47 @@
+from recipes.tests.base import QueryBudgetTestCase
+from users.authentication import token_cache
+from users.models import CustomUser, Follow
+
+ME = '/api/users/me/'
+
+
+class CachedTokenAuthenticationTest(QueryBudgetTestCase):
+
+    def setUp(self):
+        super().setUp()
+        token_cache.clear()
+        self.addCleanup(token_cache.clear)
+        self.assertEqual(self.client.get(ME).status_code, 200)
+
+    def test_cached_after_first_request(self):
+        # Only the tags are read, the token comes from the cache.
+        with self.assertNumQueries(1):
+            self.assertEqual(
+                self.client.get('/api/tags/').status_code, 200
+            )
+
+    def test_logout(self):
+        response = self.client.post('/api/auth/token/logout/')
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(self.client.get(ME).status_code, 401)
+
+    def test_deactivation(self):
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.client.get(ME).status_code, 401)
+
+    def test_write_does_not_save_stale_user(self):
+        follower = self.create_user('follower')
+        Follow.objects.create(user=follower, author=self.user)
+        CustomUser.objects.filter(pk=self.user.pk).update(
+            first_name='Renamed'
+        )
+        response = self.client.post('/api/users/set_password/', {
+            'current_password': self.password,
+            'new_password': 'Budget-password-new',
+        })
+        self.assertEqual(response.status_code, 204)
+        user = CustomUser.objects.get(pk=self.user.pk)
+        self.assertTrue(user.check_password('Budget-password-new'))
+        self.assertEqual(user.first_name, 'Renamed')
+        self.assertEqual(user.followers_count, 2)
@@ -0,0 +1,70 @@
+from recipes.tests.base import QueryBudgetTestCase
+from users.models import CustomUser, Follow
+
+MISSING_ID = 10 ** 9
+
+
+class FollowTest(QueryBudgetTestCase):
+
+    def followers(self, author):
+        return CustomUser.objects.values_list(
+            'followers_count', flat=True
+        ).get(pk=author.pk)
+
+    def test_subscribe(self):
+        author = self.spare_author
+        url = f'/api/users/{author.id}/subscribe/'
+        self.assertEqual(self.client.get(url).status_code, 201)
+        self.assertEqual(self.client.get(url).status_code, 400)
+        self.assertEqual(self.followers(author), 1)
+
+        self.assertEqual(self.client.delete(url).status_code, 204)
+        self.assertEqual(self.client.delete(url).status_code, 404)
+        self.assertEqual(self.followers(author), 0)
+        self.assertFalse(Follow.objects.filter(
+            user=self.user, author=author
+        ).exists())
+
+    def test_subscribe_to_self_or_missing(self):
+        for author_id, status in ((self.user.id, 400), (MISSING_ID, 404)):
+            with self.subTest(author_id=author_id):
+                response = self.client.get(
+                    f'/api/users/{author_id}/subscribe/'
+                )
+                self.assertEqual(response.status_code, status)
+        self.assertEqual(self.followers(self.user), 1)
+
+
+class SubscriptionsTest(QueryBudgetTestCase):
+
+    def get(self, **params):
+        response = self.client.get('/api/users/subscriptions/', params)
+        self.assertEqual(response.status_code, 200)
+        return response.data['results']
+
+    def test_recipes_limit(self):
+        for _ in range(3):
+            self.create_recipe(self.recipe.author)
+        author = next(
+            item for item in self.get()
+            if item['id'] == self.recipe.author_id
+        )
+        self.assertEqual(author['recipes_count'], 4)
+        self.assertEqual(len(author['recipes']), 4)
+        author = next(
+            item for item in self.get(recipes_limit=2)
+            if item['id'] == self.recipe.author_id
+        )
+        self.assertEqual(len(author['recipes']), 2)
+
+    def test_author_without_recipes(self):
+        Follow.objects.create(user=self.user, author=self.create_user('new'))
+        authors = {item['username']: item for item in self.get()}
+        new = next(item for name, item in authors.items() if '_new_' in name)
+        self.assertEqual(new['recipes'], [])
+        self.assertTrue(new['is_subscribed'])
+
+    def test_no_subscriptions(self):
+        Follow.objects.filter(user=self.user).delete()
+        self.assertEqual(self.get(), [])
+        self.assertEqual(self.get(pagination='cursor'), [])
@@ -1,20 +1,30 @@
 from django.contrib.auth import get_user_model
+from django.db.models import (BooleanField, Prefetch, Value,
+                              prefetch_related_objects)
+from django.http import Http404
 from django.shortcuts import get_object_or_404
 from rest_framework import generics, status
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
+from recipes.models import Recipe
+from recipes.paginators import FollowKeysetPaginator, KeysetPaginationMixin
+from recipes.relations import get_relations
+from recipes.toggles import add_relation, remove_relation
+
 from .models import CustomUser, Follow
-from .serializers import FollowSerializer, ShowFollowSerializer
+from .serializers import (FollowSerializer, ShowFollowSerializer,
+                          get_recipes_limit)
 
 User = get_user_model()
 
 
-class ListFollowViewSet(generics.ListAPIView):
+class ListFollowViewSet(KeysetPaginationMixin, generics.ListAPIView):
     queryset = CustomUser.objects.all()
     permission_classes = [IsAuthenticated, ]
     serializer_class = ShowFollowSerializer
+    keyset_pagination_class = FollowKeysetPaginator
 
     def get_serializer_context(self):
         context = super().get_serializer_context()
@@ -23,7 +33,20 @@ class ListFollowViewSet(generics.ListAPIView):
 
     def get_queryset(self):
         user = self.request.user
-        return CustomUser.objects.filter(following__user=user)
+        return CustomUser.objects.filter(following__user=user).annotate(
+            is_subscribed=Value(True, output_field=BooleanField()),
+        )
+
+    def paginate_queryset(self, queryset):
+        page = super().paginate_queryset(queryset)
+        if page is not None:
+            limit = get_recipes_limit(self.request)
+            prefetch_related_objects(page, Prefetch(
+                'recipes',
+                queryset=Recipe.objects.latest_per_author(page, limit),
+                to_attr='recipe_previews'
+            ))
+        return page
 
 
 class FollowViewSet(APIView):
@@ -35,25 +58,23 @@ class FollowViewSet(APIView):
 
     def get(self, request, author_id):
         user = request.user
-        follow_exist = Follow.objects.filter(
-            user=user,
-            author__id=author_id
-        ).exists()
-        if user.id == author_id or follow_exist:
+        author = None
+        if user.id != author_id:
+            author = get_object_or_404(User, id=author_id)
+        if author is None or not add_relation(
+            Follow, user=user, author=author
+        ):
             return Response(
                 {"Fail": "Ошибка"},
                 status=status.HTTP_400_BAD_REQUEST
             )
-        data = {
-            'user': user.id,
-            'author': author_id
-        }
-        serializer = FollowSerializer(data=data, context={'request': request})
-        serializer.is_valid(raise_exception=True)
-        serializer.save()
+        get_relations(request).add('following', author.id)
+        serializer = FollowSerializer(
+            Follow(user=user, author=author), context={'request': request}
+        )
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
     def delete(self, request, author_id):
-        obj = get_object_or_404(Follow, user=request.user, author=author_id)
-        obj.delete()
+        if not remove_relation(Follow, user=request.user, author=author_id):
+            raise Http404
         return Response(status=status.HTTP_204_NO_CONTENT)